@@ -0,0 +1,60 @@
+"""
+Measures the cost of the CastableType casts (views) used in the hot paths.
+
+For each operation it prints the time and the number of memory blocks
+retained per call, measured keeping the results alive.
+
+Usage: python benchmarks/bench_casts.py [calls]
+"""
+
+import sys
+from timeit import default_timer
+from tuneit import variable, finalize
+from tuneit.graph import Graph, Node, Key
+
+
+def measure(fnc, calls):
+    "Returns the time and the blocks retained per call of fnc"
+    results = [None] * calls
+    blocks = sys.getallocatedblocks()
+    start = default_timer()
+    for i in range(calls):
+        results[i] = fnc()
+    elapsed = default_timer() - start
+    blocks = sys.getallocatedblocks() - blocks
+    return elapsed / calls, blocks / calls
+
+
+def main(calls):
+    "Runs the benchmark"
+    var = variable(range(10), label="x")
+    node = var
+    for i in range(100):
+        node = node + i
+    high = finalize(node)
+
+    operations = {
+        "Key(node)": lambda: Key(node),
+        "Node(node)": lambda: Node(node),
+        "Graph(node)": lambda: Graph(node),
+        "Node(key)": lambda: Node(Key(node)),
+        "isinstance(node, Key)": lambda: isinstance(node, Key),
+        "node.key": lambda: Node(node).key,
+        "node + 1": lambda: node + 1,
+        "dependencies": lambda: tuple(high.dependencies),
+        "compute": lambda: high.compute(),
+    }
+
+    print("%24s %12s %10s" % ("operation", "time", "blocks"))
+    for name, fnc in operations.items():
+        num = (
+            calls
+            if name not in ("dependencies", "compute", "node + 1")
+            else calls // 100
+        )
+        elapsed, blocks = measure(fnc, max(num, 1))
+        print("%24s %10.2fus %10.1f" % (name, elapsed * 1e6, blocks))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]] or [100000])
@@ -0,0 +1,59 @@
+"""
+Compares the recursive compute against the iterative executor on long chains.
+
+Usage: python benchmarks/bench_compute.py [length ...]
+"""
+
+import sys
+import threading
+from timeit import default_timer
+from tuneit import tunable, compute
+
+
+def chain(length):
+    "Returns a chain of length additions"
+    start = tunable(1)
+    node = start
+    for _ in range(length):
+        node = node + start
+    return node
+
+
+def timed(fnc):
+    "Returns the result of fnc and the time spent"
+    start = default_timer()
+    res = fnc()
+    return res, default_timer() - start
+
+
+def recursive(node):
+    "Runs the recursive compute in a thread with a large stack"
+    out = {}
+
+    def target():
+        try:
+            out["res"], out["time"] = timed(lambda: compute(node))
+        except RecursionError as err:
+            out["res"], out["time"] = err, float("nan")
+
+    sys.setrecursionlimit(10**6)
+    threading.stack_size(512 * 1024**2)
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    return out["res"], out["time"]
+
+
+def main(lengths):
+    "Runs the benchmark"
+    print("%10s %12s %12s %12s" % ("nodes", "build", "recursive", "iterative"))
+    for length in lengths:
+        node, build = timed(lambda: chain(length))
+        res1, rec = recursive(node)
+        res2, itr = timed(lambda: compute(node, executor="iterative"))
+        assert res1 == res2 == length + 1
+        print("%10d %11.3fs %11.3fs %11.3fs" % (length, build, rec, itr))
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 5000, 10000])
@@ -0,0 +1,53 @@
+"""
+Compares the keys computed by tokenize against pickling and md5-hashing
+the parts of the nodes (the previous implementation of Object.key).
+
+Usage: python benchmarks/bench_hashing.py [nodes]
+"""
+
+import sys
+from hashlib import md5
+from timeit import default_timer
+import numpy
+from dill import dumps
+from tuneit import function, Function
+from tuneit.graph import Key
+
+
+def pickled_key(obj):
+    "The previous implementation of Object.key"
+    parts = tuple(Key(part) if isinstance(part, Key) else part for part in obj)
+    return obj.label + "-" + md5(dumps(parts)).hexdigest()
+
+
+def timed(fnc, *args):
+    "Returns the time spent by fnc(*args)"
+    start = default_timer()
+    fnc(*args)
+    return default_timer() - start
+
+
+def build(nodes, arr):
+    "Builds a graph of functions taking arr"
+    node = function(numpy.add, arr, 0)
+    for _ in range(nodes):
+        node = function(numpy.add, node, arr)
+    return node
+
+
+def main(nodes):
+    "Runs the benchmark"
+    print("%12s %12s %12s %9s" % ("argument", "pickle+md5", "tokenize", "speedup"))
+    for size in (10, 10 ** 4, 10 ** 6, 10 ** 7):
+        arr = numpy.random.rand(size)
+        objs = [Function(numpy.add, args=(arr, i)) for i in range(nodes)]
+        old = timed(lambda: [pickled_key(obj) for obj in objs])
+        new = timed(lambda: [obj.key for obj in objs])
+        print("%12s %11.3fs %11.3fs %8.1fx" % (arr.shape, old, new, old / new))
+
+    arr = numpy.random.rand(10 ** 5)
+    print("graph of %d nodes built in %.3fs" % (nodes, timed(build, nodes, arr)))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]] or [100])
@@ -12,6 +12,9 @@ extras = {
     "graph": [
         "graphviz",
     ],
+    "hash": [
+        "xxhash",
+    ],
     "test": ["pytest", "pytest-cov"],
 }
 
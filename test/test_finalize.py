@@ -48,3 +48,69 @@ def test_finalize():
     a = variable(range(10), uid=True)
     with raises(KeyError):
         finalize(a * b).fix("a")
+
+
+def test_compute_executor():
+    a = variable(range(10), default=2)
+    b = finalize(a * a + a)
+    assert b.copy().compute(executor="iterative") == 6
+    assert b.copy().compute(executor="iterative", cache=Cache()) == 6
+
+
+def test_optimize():
+    a = variable(range(10), default=2)
+    x = function(abs, a)
+    y = Function(abs, args=(a,), uid=True).tunable()
+    b = finalize(function(max, x + y, y + x))
+    b["unused"] = 1
+    assert len(b.graph.backend) == 7
+
+    stats = b.optimize()
+    assert stats == dict(before=7, after=4, merged=2, pruned=1)
+    assert len(b.functions) == 3
+    assert b.compute() == 4
+    assert b.optimize() == dict(before=4, after=4, merged=0, pruned=0)
+
+    rand = impure(lambda arg: arg)
+    b = finalize(function(rand, a) + Function(rand, args=(a,), uid=True).tunable())
+    assert b.optimize()["merged"] == 0
+    assert b.compute() == 4
+
+
+def test_fold():
+    calls = []
+
+    def slow(arg):
+        calls.append(arg)
+        return arg * 10
+
+    a = variable(range(10), default=2)
+    c = tunable(3, label="c")
+    b = finalize(function(slow, c + 1) * a + function(slow, c))
+
+    assert b.fold() == dict(before=7, after=5, folded=2)
+    assert sorted(calls) == [3, 4]
+    assert b.compute() == 110
+    assert b.copy(reset=True).compute() == 110
+    assert len(calls) == 2
+    assert len(b.functions) == 2
+
+    rand = impure(slow)
+    b = finalize(function(rand, c) + a)
+    assert b.fold()["folded"] == 0
+
+
+def test_compile():
+    a = variable(range(10), default=2)
+    b = finalize(function(max, a * a, 3, key=abs) + function(abs, -a))
+    fnc = b.compile()
+    assert fnc() == b.copy().compute() == 6
+    assert "max" not in fnc.source and "compute" not in fnc.source
+
+    b.fix("a", 3)
+    assert fnc() == 6
+    assert b.compile()() == 12
+
+    calls = []
+    b = finalize(function(calls.append, variable(range(10), default=2)))
+    assert b.compile()() == calls == [2]
@@ -1,4 +1,5 @@
 import pytest
+from pickle import dumps, loads
 from tuneit.graph import Graph, Node, Key
 
 
@@ -65,3 +66,143 @@ def test_dict_methods():
 
     b.update(a)
     assert a == b
+
+
+def test_graph_store():
+    a = Graph(dict(one=1, two=2))
+    b = a.copy()
+    b["three"] = 3
+    a["two"] = 4
+    assert dict(a) == dict(one=1, two=4)
+    assert dict(b) == dict(one=1, two=2, three=3)
+
+    c = Graph()
+    c["two"] = 5
+    c.update(a)
+    c.update(b)
+    assert c == dict(one=1, two=2, three=3)
+    del c["two"]
+    assert "two" not in c and "two" in b
+    assert c.pop("three") == 3 and "three" in b
+
+    # long chains of copies are flattened when searched
+    d = Graph(dict(start=0))
+    for i in range(100):
+        d = d.copy()
+        d[i] = i
+    assert d["start"] == 0 and len(d.backend) == 101
+    assert "missing" not in d
+
+    assert loads(dumps(d.backend)) == d.backend
+
+    # lookups and flattening follow the order of dict.update
+    x = Graph(dict(k=1))
+    y = x.copy()
+    y["k"] = 2
+    z = x.copy()
+    z["j"] = 0
+    w = Graph()
+    w.update(y)
+    w.update(z)
+    assert w["k"] == 1
+    assert len(w.backend) == 2 and w["k"] == 1
+    w.update(y)
+    assert w["k"] == 2 and dict(w) == dict(k=2, j=0)
+
+    # the set of the stored keys is shared only by the related stores
+    e = Graph(dict(other=1))
+    assert "start" not in e.backend._keys and "other" not in d.backend._keys
+    assert d.copy().backend._keys is d.backend._keys
+    e.update(d)
+    assert {"start", "other"} <= e.backend._keys and "start" in e
+
+
+def test_graph_index():
+    a = Graph(dict(one=1, two=2))
+    a["three"] = (Key("one"), Key("two"), Key("one"))
+    a["four"] = (Key("three"), Key("one"))
+    store = a.backend
+
+    assert store.dependencies("three") == ("one", "two", "one")
+    assert store.closure("four") == ("four", "three", "one", "two")
+    assert store.topological("four") == ("one", "two", "three", "four")
+    assert store.consumers("one") == ("three", "four")
+    assert store.depends_on("four", "two") and not store.depends_on("two", "four")
+    assert tuple(a["four"].dependencies) == store.closure("four")
+    assert a["four"].depends_on(Key("one"))
+
+    # copies share the index until the structure changes
+    b = a.copy()
+    assert b.backend.index is store.index
+    b["three"] = (Key("one"), Key("two"), Key("one"))
+    assert b.backend.index is store.index
+    b["three"] = (Key("two"),)
+    assert b.backend.index is not store.index
+    assert b.backend.closure("four") == ("four", "three", "two", "one")
+    assert store.closure("four") == ("four", "three", "one", "two")
+
+    # adding a key to a copy does not change the index of the original
+    c = Graph(dict(x=1))
+    c["y"] = (Key("x"),)
+    assert c.backend.consumers("x") == ("y",)
+    d = c.copy()
+    d["z"] = (Key("x"),)
+    assert d.backend.consumers("x") == ("y", "z")
+    assert c.backend.consumers("x") == ("y",) and "z" not in c.backend.index.deps
+    assert len(d.visualize(start="x").body) == 3 + 2
+
+    # missing dependencies are found once added
+    c["w"] = (Key("v"), Key("x"))
+    assert c.backend.topological("w") == ("x", "w")
+    c["v"] = 0
+    assert c.backend.topological("w") == ("v", "x", "w")
+
+
+class Tuple(tuple):
+    __label__ = "g"
+    __dot_attrs__ = {}
+
+
+def test_visualize_large(tmp_path):
+    a = Graph()
+    a["x"] = String("x")
+    for i in range(10):
+        a["f%d" % i] = String("f")
+        a["g%d" % i] = Tuple((Key("f%d" % i), Key("x")))
+    a["end"] = tuple(Key("g%d" % i) for i in range(10))
+
+    assert len(a.visualize().body) == 22 + 30
+    assert len(a.visualize(end="end", start="x").body) == 12 + 20
+
+    dot = a.visualize(end="end", collapse=True)
+    assert len(dot.body) == 4 + 3
+    assert "x10" in dot.source
+
+    dot = a.visualize(end="end", max_nodes=5)
+    assert "18 more nodes" in dot.source
+    assert dot.source.count("dashed") == 4
+
+    filename = str(tmp_path / "graph.dot")
+    assert a.visualize(end="end", filename=filename) == filename
+    with open(filename) as out:
+        source = out.read()
+    assert source.startswith("digraph {") and source.count("->") == 30
+    assert '"g0" -> "end"' in source
+
+
+def test_views():
+    a = Graph()
+    a["foo"] = String("bar")
+    node = a["foo"]
+
+    # views share the values of the original object
+    key = Key(node)
+    key.key = "foo2"
+    assert node.key == "foo2"
+    key.key = "foo"
+
+    # upcasting a view only takes the attrs of the view
+    graph = Graph(node)
+    assert not isinstance(graph, Key)
+    Key(graph["foo3"]).key = "foo4"
+    assert node.key == "foo"
@@ -0,0 +1,60 @@
+import numpy
+from tuneit import tokenize, normalize, register, function, tunable, Object, Function
+from tuneit import hashing
+
+
+def test_tokenize():
+    assert tokenize(1, "a") == tokenize(1, "a")
+    assert tokenize(1) != tokenize(1.0) != tokenize(True)
+    assert tokenize([1, 2]) != tokenize((1, 2))
+    assert tokenize({"a": 1}) != tokenize({"a": 2})
+    assert tokenize({1, 2}) == tokenize({2, 1})
+    assert tokenize(numpy.arange(3)) == tokenize(numpy.arange(3))
+    assert tokenize(numpy.arange(3)) != tokenize(numpy.arange(3.0))
+    assert tokenize(numpy.arange(3)) != tokenize(numpy.arange(4)[:3].reshape(3, 1))
+    assert tokenize(numpy.float64(1)) != tokenize(numpy.float32(1))
+    assert tokenize(numpy.array([None])) == tokenize(numpy.array([None]))
+
+
+def test_identity():
+    size = hashing.LARGE_BUFFER // 8 + 1
+    arr = numpy.zeros(size)
+    assert tokenize(arr) == tokenize(arr)
+    assert tokenize(arr) != tokenize(numpy.zeros(size))
+
+    gen = (i for i in range(3))
+    assert normalize(gen)[0] == "id"
+    assert tokenize(gen) == tokenize(gen) != tokenize(i for i in range(3))
+
+    fnc = lambda x: x
+    assert tokenize(fnc) == tokenize(fnc)
+    assert id(fnc) in hashing._IDS
+    key = id(fnc)
+    del fnc
+    assert key not in hashing._IDS
+
+
+def test_register():
+    class Foo:
+        def __init__(self, val):
+            self.val = val
+
+    @register(Foo)
+    def normalize_foo(obj):
+        return ("Foo", obj.val)
+
+    assert normalize(Foo(1)) == ("Foo", 1)
+    assert tokenize(Foo(1)) == tokenize(Foo(1)) != tokenize(Foo(2))
+    del hashing.normalizers[Foo]
+
+
+def test_keys():
+    arr = numpy.arange(10)
+    assert Object(arr).key == Object(numpy.arange(10)).key
+    assert Function(numpy.sum, args=(arr,)).key == Function(numpy.sum, args=(arr,)).key
+    assert (
+        Function(numpy.sum, args=(arr,)).key != Function(numpy.sum, args=(arr + 1,)).key
+    )
+    gen = (i for i in range(3))
+    assert Object(gen).key == Object(gen).key
+    assert str(function(abs, tunable(1)).key) == str(function(abs, tunable(1)).key)
@@ -0,0 +1,73 @@
+from itertools import permutations
+from pytest import raises
+from numpy import linspace, geomspace, allclose
+from tuneit.space import *
+from tuneit.variable import Variable, Permutation
+
+
+def test_values():
+    vals = space([3, 1, 2])
+    assert len(vals) == 3
+    assert vals[1] == 1 and vals[-1] == 2 and vals[:2] == (3, 1)
+    assert 2 in vals and 4 not in vals
+    assert vals.index(2) == 2
+    assert vals == (3, 1, 2)
+    assert space(range(10)) == range(10)
+
+    vals = space([[1], [2]])
+    assert [2] in vals and [3] not in vals
+
+    with raises(IndexError):
+        vals[2]
+
+
+def test_grid():
+    grid = Grid(0, 1, 11)
+    assert allclose(tuple(grid), linspace(0, 1, 11))
+    assert 0.3 in grid and 0.35 not in grid and "a" not in grid
+    assert grid.index(0.3) == 3
+    assert grid[-1] == 1
+    assert Grid(1, 1, 1) == (1,)
+
+    grid = LogGrid(1, 1e6, 7)
+    assert allclose(tuple(grid), geomspace(1, 1e6, 7))
+    assert 1000 in grid and 2000 not in grid and 1e7 not in grid
+    assert grid.index(100) == 2
+    assert "LogGrid" in repr(grid)
+
+    with raises(ValueError):
+        LogGrid(0, 1, 2)
+    with raises(ValueError):
+        Grid(0, 1, 0)
+
+    var = Variable(LogGrid(1, 2 ** 60, 61))
+    assert var.size == 61
+    with raises(ValueError):
+        var.fix(3)
+    var.value = 2 ** 10
+
+
+def test_permutations():
+    perms = Permutations("abcd")
+    assert len(perms) == 24
+    assert tuple(perms) == tuple(perms[idx] for idx in range(24))
+    assert all(perms.index(val) == idx for idx, val in enumerate(permutations("abcd")))
+    assert tuple("dcba") in perms and tuple("abcc") not in perms
+    assert (1, 2) not in perms and 1 not in perms
+
+    var = Permutation(range(20))
+    assert var.size == 2432902008176640000
+    assert var.get_value(var.size - 1) == tuple(reversed(range(20)))
+    var.value = tuple(reversed(range(20)))
+
+    # sizes larger than sys.maxsize
+    from math import factorial
+    from tuneit import sample
+
+    var = Permutation(range(21))
+    assert var.size == factorial(21) and Variable(range(10 ** 20)).size == 10 ** 20
+    res = sample(var.tunable(), samples=3)
+    assert res.max_samples == factorial(21) and len(dict(res)) == 3
+
+    with raises(TypeError):
+        Space()
@@ -0,0 +1,378 @@
+import asyncio
+from pytest import raises
+from tuneit import variable, function, finalize, sample, benchmark, crosscheck
+from tuneit import TuningStore, graph_key, BayesSampler, HalvingSampler, Permutation
+from tuneit import robust_timer, Timing, memory_benchmark, memory_usage, Memory
+from tuneit import pareto, pareto_front
+from time import sleep
+from dill import dumps, loads
+from tuneit.tools import base
+
+
+def test_sample():
+    a = variable(range(4), label="a")
+    b = variable(range(3), label="b")
+    c = function(lambda x, y: x * 10 + y, a, b)
+
+    res = sample(c, samples=None)
+    expected = tuple(res.samples)
+    assert len(tuple(res.samples)) == 12
+    assert dict(res) == {(i, j): i * 10 + j for i in range(4) for j in range(3)}
+    assert "a" in res.tabulate()
+
+    res = sample(c, "a", samples=None)
+    assert dict(res) == {(i,): i * 10 for i in range(4)}
+
+    with raises(ValueError):
+        sample(c, samples=-1)
+
+    res = sample(c, samples=5)
+    samples = tuple(res.samples)
+    assert len(set(samples)) == len(res) == 5
+    assert all(params in expected for params in samples)
+    assert samples == tuple(sorted(samples))
+    assert all(res.unrank(idx) == val for idx, val in enumerate(expected))
+
+    big = [variable(range(100), label="v%d" % i) for i in range(10)]
+    res = sample(function(lambda *args: sum(args), *big), samples=3)
+    assert res.max_samples == 100 ** 10
+    assert len(tuple(res.samples)) == 3
+
+
+def test_workers():
+    a = variable(range(4), label="a")
+    b = variable(range(3), label="b")
+    c = function(lambda x, y: x * 10 + y, a, b)
+    expected = list(sample(c, samples=None))
+
+    assert list(sample(c, samples=None, workers=2)) == expected
+    assert sorted(sample(c, samples=None, workers=2, ordered=False)) == expected
+    xcheck = dict(crosscheck(c, workers=2, reference=0))
+    assert xcheck.pop((0, 0)) and not any(xcheck.values())
+
+    times = dict(benchmark(c, workers=2, timer_kwargs=dict(number=2)))
+    assert len(times) == 12
+    assert all(val > 0 for val in times.values())
+
+
+calls = []
+
+
+def fnc(x, y):
+    calls.append((x, y))
+    return x * 10 + y
+
+
+def test_store(tmp_path):
+    def graph():
+        a = variable(range(4), label="a")
+        b = variable(range(3), label="b")
+        return function(fnc, a, b)
+
+    store = TuningStore(str(tmp_path / "store.db"), name="test")
+    expected = dict(sample(graph(), samples=None))
+    assert len(calls) == 12
+
+    assert graph_key(graph()) == graph_key(graph())
+    assert dict(sample(graph(), samples=None, store=store)) == expected
+    assert len(calls) == 24
+    assert dict(sample(graph(), samples=None, store=store.path)) == expected
+    assert len(calls) == 24
+    assert dict(sample(graph(), "a", samples=None, store=store)) != expected
+    assert len(calls) == 28
+
+    c = finalize(graph())
+    assert store.best(c, label="foo") == {}
+    assert store.best(c, label=c.label, objective=max) == {
+        c.get_variable("a").key: 3,
+        c.get_variable("b").key: 2,
+    }
+    assert store.fix(c, label=c.label) == {
+        c.get_variable("a").key: 0,
+        c.get_variable("b").key: 0,
+    }
+    assert not c.tunable_variables
+
+    # invalidation
+    a = variable(range(5), label="a")
+    other = TuningStore(store.path, name="test")
+    list(sample(a, samples=None, store=other))
+    assert not list(store.results(graph_key(graph()), c.label))
+    store.clear()
+
+
+def test_bayes(monkeypatch):
+    a = variable(range(30), label="a")
+    b = variable(["x", "y", "z"], label="b")
+    c = Permutation(range(4), label="c").tunable()
+    d = function(
+        lambda x, y, z: (x - 17) ** 2 + (y != "y") * 100 + sum(z[:2]), a, b, c
+    )
+
+    with raises(ValueError):
+        sample(d, strategy="foo")
+
+    res = sample(d, strategy="bayes", samples=60, seed=1)
+    assert isinstance(res, BayesSampler)
+    results = list(res)
+    assert len(results) == len(set(params for params, _ in results)) == 60
+    best = [best for _, best in res.history]
+    assert best == sorted(best, reverse=True)
+    assert best[-1] == min(result for _, result in results)
+    assert best[-1] < 20
+    assert "best" in res.tabulate()
+
+    res = benchmark(d, strategy="bayes", budget=5, timer_kwargs=dict(number=1))
+    assert len(list(res)) == 5
+
+    # with workers the points are proposed in batches evaluated in one pool
+    pools = []
+
+    class Pool(base.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(base, "ProcessPoolExecutor", Pool)
+    res = sample(d, strategy="bayes", samples=7, startup=2, workers=2, seed=1)
+    results = list(res)
+    assert len(set(params for params, _ in results)) == len(res.history) == 7
+    assert len(pools) == 1
+
+
+def test_halving():
+    a = variable(range(30), label="a")
+    b = function(lambda x: sum(range(x * 1000)), a)
+
+    res = benchmark(b, strategy="halving", timer_kwargs=dict(number=9))
+    assert isinstance(res, HalvingSampler)
+    times = dict(res)
+    assert len(times) == 30
+    assert res.rounds == [(1, 30), (3, 10), (9, 4)]
+    assert min(times, key=times.get) in [(i,) for i in range(10)]
+
+    # the discarded samples are given at the end of their round
+    items = iter(res)
+    next(items)
+    assert res.rounds == [(1, 30)]
+    with raises(TypeError):
+        sample(b, strategy="halving", callback=lambda fnc: fnc())
+
+    res = benchmark(b, strategy="halving", samples=1, timer_kwargs=dict(number=4))
+    assert len(dict(res)) == 1
+    assert res.rounds == [(4, 1)]
+
+    with raises(ValueError):
+        benchmark(b, strategy="halving", eta=1)
+
+
+def test_robust_timer():
+    res = robust_timer(lambda: sum(range(100)), repeat=5, target=0.01)
+    assert isinstance(res, Timing)
+    assert len(res.samples) == 5 and res.number > 1
+    assert res.min <= res.median <= max(res.samples)
+    assert res.ci[0] <= res.mean <= res.ci[1]
+    assert "±" in str(res) and str(res).count(res.unit) == 2
+
+    res = Timing([1, 1, 1, 1, 1.1, 10])
+    assert res == 1 and res.outliers == 1
+    assert res.mean == 1.02 and res.stddev > 0
+    assert abs(res.ci[1] - res.mean - 1.959964 * res.stddev / 5 ** 0.5) < 1e-6
+    assert loads(dumps(res)).samples == res.samples
+
+    a = variable(range(3), label="a")
+    res = benchmark(a, timer=robust_timer, timer_kwargs=dict(number=2, repeat=3))
+    assert all(isinstance(val, Timing) for val in dict(res).values())
+    assert "stddev" in res.tabulate(columns=["min", "stddev"])
+
+
+def test_incremental():
+    setup_calls = []
+
+    def setup(x):
+        setup_calls.append(x)
+        return x
+
+    a = variable(range(3), label="a")
+    b = variable(range(4), label="b")
+    c = function(setup, 10)
+    d = function(setup, a) * 10 + b + c
+    expected = dict(sample(d, samples=None))
+    setup_calls.clear()
+
+    res = sample(d, samples=None, incremental=True)
+    assert dict(res) == expected
+    assert sorted(setup_calls) == [0, 1, 2, 10]
+    assert res.skipped > 0 and res.cache.misses < 12 * 4
+
+    # the nodes not depending on the variables are reused in the next sweep
+    skipped = res.skipped
+    assert dict(res) == expected
+    assert res.skipped == skipped + 1
+    assert sorted(setup_calls) == [0, 0, 1, 1, 2, 2, 10]
+
+    times = dict(benchmark(d, incremental=True, timer_kwargs=dict(number=2)))
+    assert len(times) == 12
+
+    # every timed call evaluates the nodes depending on the changed variables
+    def slow(x, y):
+        sleep(0.005)
+        return x + y
+
+    e = function(slow, function(slow, a, 1), variable(range(2), label="e"))
+    res = benchmark(e, incremental=True, timer_kwargs=dict(number=3))
+    times = {params: float(time) for params, time in res}
+    for x in range(3):
+        assert times[(x, 0)] >= 0.01
+        assert 0.005 <= times[(x, 1)] < 0.75 * times[(x, 0)]
+    reference = sample(e, samples=None, incremental=True)
+    assert dict(reference) and res.skipped == reference.skipped
+
+
+def test_order():
+    a = variable(range(3), label="a")
+    b = variable(range(4), label="b")
+    c = function(lambda x: x + 1, b) * 2 + a
+    expected = dict(sample(c, "a", "b", samples=None))
+
+    res = sample(c, "a", "b", samples=None, order="depth")
+    assert dict(res) == expected
+    assert [params for params, _ in res][:4] == [(0, 0), (1, 0), (2, 0), (0, 1)]
+
+    res = sample(c, "a", "b", samples=None, order="gray")
+    assert dict(res) == expected
+    samples = list(res.samples)
+    assert samples[:4] == [(0, 0), (1, 0), (2, 0), (2, 1)]
+    assert all(
+        sum(abs(x - y) for x, y in zip(prev, curr)) == 1
+        for prev, curr in zip(samples, samples[1:])
+    )
+    assert len(tuple(sample(c, "a", "b", samples=5, order="gray").samples)) == 5
+    assert res.nesting == (1, 0) and res.nesting is res.nesting
+
+    with raises(ValueError):
+        sample(c, order="foo")
+
+
+def test_lru():
+    calls.clear()
+    a = variable(range(3), label="a")
+    b = variable(range(4), label="b")
+    c = function(fnc, b, 0) + a
+    expected = dict(sample(c, "a", "b", samples=None))
+    calls.clear()
+
+    # without the LRU b is computed again every time it changes
+    res = sample(c, "a", "b", samples=None, incremental=True)
+    assert dict(res) == expected and len(calls) == 12
+
+    calls.clear()
+    res = sample(c, "a", "b", samples=None, max_memory=10 ** 6)
+    assert dict(res) == expected and len(calls) == 4
+    assert res.lru.memory <= 10 ** 6
+    assert dict(res) == expected and len(calls) == 4
+    assert res.skipped > 0
+
+    calls.clear()
+    res = sample(c, "a", "b", samples=None, max_memory=0)
+    assert dict(res) == expected and len(calls) == 12
+    assert not res.lru
+
+
+def test_memory_benchmark(monkeypatch):
+    res = memory_usage(lambda: bytearray(2 ** 20))
+    assert isinstance(res, Memory) and res >= 2 ** 20
+    assert "MiB" in str(res) and res.rss > res
+    assert loads(dumps(res)).rss == res.rss
+
+    a = variable([2 ** 10, 2 ** 16], label="a")
+    b = function(bytearray, a)
+    res = dict(memory_benchmark(b))
+    assert 2 ** 10 <= res[(2 ** 10,)] < res[(2 ** 16,)]
+
+    res = dict(memory_benchmark(b, isolated=True, samples=1))
+    assert len(res) == 1 and all(isinstance(val, Memory) for val in res.values())
+
+    c = function(lambda x: __import__("os")._exit(1), a)
+    res = dict(memory_benchmark(c, isolated=True))
+    assert all(isinstance(val, MemoryError) for val in res.values())
+
+    # already tracing, also without tracemalloc.reset_peak (python < 3.9)
+    import tracemalloc
+
+    tracemalloc.start(2)
+    try:
+        bytearray(2 ** 22)
+        assert 2 ** 20 <= memory_usage(lambda: bytearray(2 ** 20)) < 2 ** 21
+        monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)
+        bytearray(2 ** 22)
+        assert 2 ** 20 <= memory_usage(lambda: bytearray(2 ** 20)) < 2 ** 21
+        assert tracemalloc.is_tracing() and tracemalloc.get_traceback_limit() == 2
+    finally:
+        tracemalloc.stop()
+
+
+def test_pareto():
+    points = [[1, 4], [2, 2], [4, 1], [3, 3], [1, 5], [2, 2]]
+    assert pareto_front(points).tolist() == [1, 1, 1, 0, 0, 1]
+
+    a = variable(range(5), label="a")
+    b = function(lambda x: x, a)
+    metrics = dict(
+        cost=(lambda fnc: fnc(), True),
+        error=(lambda fnc: (fnc() - 3) ** 2, True),
+        score=(lambda fnc: fnc() % 2, False),
+    )
+    res = pareto(b, metrics=metrics)
+    assert len(dict(res)) == 5
+    front = dict(res.front())
+    assert set(front) == {(0,), (1,), (2,), (3,)}
+    assert front[(1,)] == dict(cost=1, error=4, score=1)
+
+    assert res.select() == (1,)
+    assert res.select(score=1, weights=dict(error=10)) == (3,)
+    assert res.select(cost=0) == (0,)
+    assert res.fix(cost=0).compute() == 0
+    with raises(ValueError):
+        res.select(cost=-1)
+    with raises(ValueError):
+        res.select(foo=1)
+    assert "pareto" in res.tabulate()
+
+    res = pareto(b, "a", metrics=("time", "memory", "xcheck"), samples=2)
+    assert all(len(val) == 3 for val in dict(res).values())
+    with raises(ValueError):
+        pareto(b, metrics=("foo",))
+    with raises(TypeError):
+        pareto(b, callback=lambda fnc: fnc())
+
+
+def run_async(coro):
+    "Runs the coroutine in a new event loop (asyncio.run needs python 3.7)"
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_async_sampler():
+    async def fetch(x):
+        await asyncio.sleep(0.01)
+        return x * 2
+
+    a = variable(range(5), label="a")
+    b = function(fetch, a) + 1
+
+    async def collect(sampler):
+        return [item async for item in sampler]
+
+    expected = [((x,), 2 * x + 1) for x in range(5)]
+    assert run_async(collect(sample(b, samples=None))) == expected
+    assert run_async(collect(sample(b, samples=None, concurrency=3))) == expected
+
+    # iterated in a thread
+    c = a * 2 + 1
+    assert run_async(collect(sample(c, samples=None, incremental=True))) == expected
+    res = run_async(collect(benchmark(c, timer_kwargs=dict(number=1))))
+    assert [params for params, _ in res] == [(x,) for x in range(5)]
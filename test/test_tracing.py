@@ -0,0 +1,35 @@
+import json
+from tuneit import variable, function, finalize, Tracer
+from tuneit import tracing
+
+
+def test_tracer(tmp_path):
+    a = variable(range(10), default=2, label="a")
+    b = finalize(function(max, a * 2, a + 1))
+
+    with Tracer() as tracer:
+        assert tracing.current is tracer
+        assert b.compute() == 4
+        assert b.compute(executor="threads") == 4
+    assert tracing.current is None
+
+    keys = set(map(str, b.dependencies))
+    assert set(tracer.stats) == keys
+    assert tracer.stats[str(b.key)].calls == 2
+    assert tracer.hot("wall")[0] == str(b.key)
+    for stats in tracer.stats.values():
+        assert 0 <= stats.self <= stats.wall
+
+    table = tracer.tabulate(limit=2)
+    assert "calls" in table and len(table.splitlines()) == 4
+
+    trace = tracer.chrome_trace(tmp_path / "trace.json")
+    with open(tmp_path / "trace.json") as inp:
+        assert json.load(inp) == trace
+    assert len(trace["traceEvents"]) == len(tracer.events)
+    assert all(event["ph"] == "X" for event in trace["traceEvents"])
+
+    assert sum(stats.calls for stats in tracer.stats.values()) == len(tracer.events)
+    events = len(tracer.events)
+    b.compute()
+    assert len(tracer.events) == events
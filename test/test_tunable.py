@@ -1,3 +1,4 @@
+import asyncio
 from pickle import dumps
 from pytest import raises
 from tuneit.graph import visualize, Node
@@ -88,3 +89,143 @@ def test_tunable():
         bool(tunable(1))
 
     assert dumps(a)
+
+
+def test_cache():
+    calls = []
+
+    def add(*args):
+        calls.append(args)
+        return sum(args)
+
+    a = tunable(1)
+    for _ in range(5):
+        a = function(add, a, a)
+
+    assert compute(a) == 32
+    assert len(calls) == 2 ** 5 - 1
+
+    calls.clear()
+    cache = Cache()
+    assert compute(a, cache=cache) == 32
+    assert len(calls) == 5
+    assert cache.misses == 6
+    assert cache.hits == 5
+    assert cache.saved == 2 ** 6 - 1 - cache.misses
+    assert "saved" in repr(cache)
+
+    calls.clear()
+    assert compute(a, cache=True) == 32
+    assert len(calls) == 5
+
+    cache.reset()
+    assert not cache and cache.hits == 0
+
+
+def test_iterative():
+    a = tunable(1)
+    b = a
+    for _ in range(2000):
+        b = b + a
+    with raises(RecursionError):
+        compute(b)
+    assert compute(b, executor="iterative") == 2001
+
+    with raises(ValueError):
+        compute(b, executor="foo")
+
+    lst = Object([1, 2]).tunable()
+    lst = lst.append(3)
+    assert compute(lst, executor="iterative") == [1, 2, 3]
+    assert compute(Object(1, deps=a), executor="iterative") == 1
+    assert compute(1, executor="iterative") == 1
+
+
+def test_threads():
+    from time import sleep
+
+    def slow(val):
+        sleep(0.05)
+        return val
+
+    a = tunable(1)
+    b = sum(function(slow, a + i) for i in range(8))
+
+    stats = {}
+    assert compute(b, executor="threads", max_workers=8, stats=stats) == 36
+    assert stats["total_work"] >= 8 * 0.05
+    assert stats["critical_path"] < stats["total_work"]
+    assert stats["parallelism"] > 2
+    assert len(stats["times"]) == len(tuple(Node(b).dependencies))
+    assert compute(b, executor="threads") == compute(b)
+
+
+def test_release():
+    import numpy
+
+    x = function(numpy.ones, 1000)
+    b = x
+    for _ in range(5):
+        b = b * 2 + 1
+
+    stats = {}
+    res = compute(b, executor="release", stats=stats)
+    assert (res == 63).all()
+    assert stats["total"] == 11 * 8000 and stats["peak"] == 2 * 8000
+    assert stats["reused"] == 0
+
+    # the array of numpy.ones is not reused: it was not created by a ufunc
+    res = compute(b, executor="release", reuse=True, stats=stats)
+    assert (res == 63).all()
+    assert stats["peak"] == 2 * 8000 and stats["reused"] == 9
+
+    # arrays returned by other functions are never overwritten
+    ones = numpy.ones(1000)
+    z = function(lambda: ones)
+    assert (compute((z + 1) * 2, executor="release", reuse=True) == 4).all()
+    assert (ones == 1).all()
+
+    # y is x: it is not reused by y + 1 since x is still needed
+    y = function(lambda arg: arg, x)
+    c = (y + 1) + x
+    assert (compute(c, executor="release", reuse=True, stats=stats) == 3).all()
+    assert stats["reused"] == 1
+
+    assert compute(tunable(1) + 1, executor="release", reuse=True) == 2
+
+
+def run_async(coro):
+    "Runs the coroutine in a new event loop (asyncio.run needs python 3.7)"
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_acompute():
+    from tuneit.executor import acompute
+    from tuneit.finalize import finalize
+
+    running = []
+
+    async def fetch(x):
+        running.append(x)
+        peak = len(running)
+        await asyncio.sleep(0.01)
+        running.remove(x)
+        return x * 2, peak
+
+    a = tunable(1)
+    b = [function(fetch, a + i) for i in range(4)]
+    c = function(lambda *res: (sum(x for x, _ in res), max(p for _, p in res)), *b)
+
+    assert run_async(acompute(c)) == (20, 4)
+    assert run_async(acompute(c, max_concurrency=2)) == (20, 2)
+    assert run_async(finalize(c).acompute()) == (20, 4)
+    assert run_async(acompute(function(fetch, 3)))[0] == 6
+    assert run_async(acompute(a + 1)) == 2
+
+    failing = function(fetch, None) + c
+    with raises(TypeError):
+        run_async(acompute(failing))
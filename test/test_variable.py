@@ -49,8 +49,11 @@ def test_variable():
     d.value = Variable(range(10))
 
     d = Permutation((1, 2, 3))
+    assert tuple(map(d.get_value, range(d.size))) == tuple(d.values)
     d.value = (3, 2, 1)
     assert d.size == 6
+    with raises(IndexError):
+        d.get_value(6)
 
     d = Variable([0])
     assert d.fixed
@@ -61,6 +64,8 @@ def test_variable():
 
     d = Variable((i for i in [1, 2, 3]))
     assert d.values == (1, 2, 3)
+    assert d.get_value(1) == 2
+    assert Variable({1: 2, 3: 4}.keys()).get_value(1) == 3
 
 
 def test_copy():
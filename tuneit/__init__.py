@@ -3,8 +3,12 @@
 __version__ = "0.0.4"
 
 from .graph import *
+from .hashing import *
 from .tunable import *
+from .space import *
 from .variable import *
 from .finalize import *
+from .executor import *
+from .tracing import *
 from .class_utils import *
 from .tools import *
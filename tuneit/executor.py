@@ -0,0 +1,507 @@
+"""
+Execution engines for computing the tunable graphs
+"""
+# pylint: disable=C0303,C0330
+
+__all__ = [
+    "Schedule",
+    "executors",
+    "compile_graph",
+    "acompute",
+]
+
+import sys
+import asyncio
+import operator
+from inspect import isawaitable
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from timeit import default_timer
+import numpy
+from .graph import Graph, Node, Key
+from .tunable import Cache, Object, Function, compute, _compute
+from .variable import Variable
+from . import tracing
+
+
+class Schedule:
+    """
+    Topological order of the nodes needed for computing the given roots.
+
+    The order is the cached topological order of the graph store (see
+    GraphStore.topological), where every node comes after all its dependencies.
+
+    Attributes
+    ----------
+    keys: tuple
+        The keys of the nodes in topological order
+    index: dict
+        Position of each key in keys
+    deps: tuple
+        For each node, the positions of its direct dependencies
+    consumers: tuple
+        For each node, the positions of the nodes that depend on it
+    """
+
+    def __init__(self, graph, roots):
+        self.graph = Graph(graph)
+        if isinstance(roots, (str, Key)):
+            roots = (roots,)
+
+        backend = self.graph.backend
+        keys = []
+        index = {}
+        for root in roots:
+            root = Key(root).key if isinstance(root, Key) else root
+            if root in index or root not in backend:
+                continue
+            for key in backend.topological(root):
+                if key not in index:
+                    index[key] = len(keys)
+                    keys.append(key)
+
+        self.keys = tuple(keys)
+        self.index = index
+        self.deps = tuple(
+            tuple(index[dep] for dep in self.first_dependencies(key))
+            for key in self.keys
+        )
+        consumers = tuple([] for _ in self.keys)
+        for idx, deps in enumerate(self.deps):
+            for dep in deps:
+                consumers[dep].append(idx)
+        self.consumers = tuple(map(tuple, consumers))
+
+    def first_dependencies(self, key):
+        "Returns the keys of the direct dependencies of key that are in the graph"
+        backend = self.graph.backend
+        deps = []
+        for dep in backend.dependencies(key):
+            if dep in backend and dep not in deps:
+                deps.append(dep)
+        return deps
+
+    def downstream(self, keys):
+        "Returns the keys of the given nodes and of all the nodes depending on them"
+        todo = [self.index[key] for key in keys if key in self.index]
+        seen = set(todo)
+        while todo:
+            for idx in self.consumers[todo.pop()]:
+                if idx not in seen:
+                    seen.add(idx)
+                    todo.append(idx)
+        return set(self.keys[idx] for idx in seen)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def evaluate(self, idx, **kwargs):
+        "Evaluates the node at position idx storing the result in the cache"
+        key = self.keys[idx]
+        cache = kwargs["cache"]
+        if key in cache:
+            return cache[key]
+        value = self.graph.backend[key]
+        tracer = tracing.current
+        if tracer is not None:
+            return cache.set_value(
+                key, lambda: tracer.record(key, _compute, value, **kwargs)
+            )
+        return cache.set_value(key, lambda: _compute(value, **kwargs))
+
+    def critical_path(self, times):
+        "Length of the longest chain of dependent nodes weighted by times"
+        path = [0.0] * len(self.keys)
+        for idx, deps in enumerate(self.deps):
+            path[idx] = times[idx] + max((path[dep] for dep in deps), default=0.0)
+        return max(path, default=0.0)
+
+    def prepare(self, **kwargs):
+        "Returns the kwargs to be used with evaluate"
+        kwargs.setdefault("maxiter", 3)
+        kwargs["graph"] = self.graph
+        if not isinstance(kwargs.get("cache", None), Cache):
+            kwargs["cache"] = Cache()
+        return kwargs
+
+    def run(self, **kwargs):
+        "Evaluates all the nodes in order and returns the cache"
+        kwargs = self.prepare(**kwargs)
+        for idx in range(len(self.keys)):
+            self.evaluate(idx, **kwargs)
+        return kwargs["cache"]
+
+
+def roots_of(obj):
+    "Returns the keys that need to be computed before obj"
+    if isinstance(obj, Key):
+        return (Key(obj).key,)
+    try:
+        return tuple(Key(part).key for part in obj if isinstance(part, Key))
+    except TypeError:
+        return ()
+
+
+def iterative(obj, **kwargs):
+    """
+    Computes obj evaluating the graph in topological order.
+    The recursion depth does not depend on the depth of the graph.
+    """
+    if isinstance(obj, Node):
+        kwargs.setdefault("graph", Node(obj).graph)
+    if "graph" not in kwargs:
+        return compute(obj, **kwargs)
+
+    schedule = Schedule(kwargs["graph"], roots_of(obj))
+    kwargs["cache"] = schedule.run(**kwargs)
+    return compute(obj, **kwargs)
+
+
+def threads(obj, max_workers=None, stats=None, **kwargs):
+    """
+    Computes obj evaluating the independent nodes of the graph concurrently.
+    A node is submitted to a ThreadPoolExecutor as soon as all its
+    dependencies have been computed.
+
+    Parameters
+    ----------
+    max_workers: int
+        Maximum number of threads. See help(ThreadPoolExecutor).
+    stats: dict
+        If given, it is filled with the execution statistics:
+        - times: the time spent by each node (key -> seconds)
+        - total_work: the sum of the times
+        - critical_path: the time of the longest chain of dependent nodes
+        - parallelism: total_work / critical_path, i.e. the achievable speedup
+    """
+    if isinstance(obj, Node):
+        kwargs.setdefault("graph", Node(obj).graph)
+    if "graph" not in kwargs:
+        return compute(obj, **kwargs)
+
+    schedule = Schedule(kwargs["graph"], roots_of(obj))
+    kwargs = schedule.prepare(**kwargs)
+    waiting = [len(deps) for deps in schedule.deps]
+    times = [0.0] * len(schedule)
+
+    def evaluate(idx):
+        start = default_timer()
+        schedule.evaluate(idx, **kwargs)
+        times[idx] = default_timer() - start
+        return idx
+
+    with ThreadPoolExecutor(max_workers) as pool:
+        pending = set(
+            pool.submit(evaluate, idx) for idx, num in enumerate(waiting) if not num
+        )
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for idx in schedule.consumers[future.result()]:
+                    waiting[idx] -= 1
+                    if not waiting[idx]:
+                        pending.add(pool.submit(evaluate, idx))
+
+    if stats is not None:
+        stats["times"] = dict(zip(schedule.keys, times))
+        stats["total_work"] = sum(times)
+        stats["critical_path"] = schedule.critical_path(times)
+        stats["parallelism"] = (
+            stats["total_work"] / stats["critical_path"]
+            if stats["critical_path"]
+            else 1.0
+        )
+
+    return compute(obj, **kwargs)
+
+
+async def acompute(obj, max_concurrency=None, **kwargs):
+    """
+    Computes obj awaiting the coroutine functions of the graph.
+
+    The nodes are evaluated as asyncio tasks, each one as soon as all its
+    dependencies have been computed, such that the independent awaitables
+    run concurrently (implies cache). The functions that are not coroutines
+    are called directly, blocking the event loop while they run.
+
+    Parameters
+    ----------
+    max_concurrency: int
+        If given, the maximum number of nodes evaluated at the same time.
+    kwargs: dict
+        Variables passed to the compute function. See help(compute)
+    """
+    if isinstance(obj, Node):
+        kwargs.setdefault("graph", Node(obj).graph)
+    if "graph" not in kwargs:
+        return await awaited(compute(obj, **kwargs), **kwargs)
+
+    schedule = Schedule(kwargs["graph"], roots_of(obj))
+    kwargs = schedule.prepare(**kwargs)
+    cache = kwargs["cache"]
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+    tasks = []
+
+    async def evaluate(idx):
+        await asyncio.gather(*(tasks[dep] for dep in schedule.deps[idx]))
+        key = schedule.keys[idx]
+        if key in cache:
+            return
+        value = schedule.graph.backend[key]
+        if semaphore is None:
+            result = await awaited(_compute(value, **kwargs), **kwargs)
+        else:
+            async with semaphore:
+                result = await awaited(_compute(value, **kwargs), **kwargs)
+        cache.set_value(key, lambda: result)
+
+    for idx in range(len(schedule)):
+        tasks.append(asyncio.ensure_future(evaluate(idx)))
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    return await awaited(compute(obj, **kwargs), **kwargs)
+
+
+async def awaited(result, **kwargs):
+    "Awaits the result, and the computation of its value, while awaitable"
+    while isawaitable(result):
+        result = compute(await result, **kwargs)
+    return result
+
+
+def sizeof(value):
+    "Approximated size in bytes of value"
+    return getattr(value, "nbytes", None) or sys.getsizeof(value)
+
+
+ufuncs = {
+    operator.add: numpy.add,
+    operator.sub: numpy.subtract,
+    operator.mul: numpy.multiply,
+    operator.truediv: numpy.true_divide,
+    operator.floordiv: numpy.floor_divide,
+    operator.mod: numpy.remainder,
+    operator.pow: numpy.power,
+    operator.neg: numpy.negative,
+    operator.abs: numpy.absolute,
+}
+"The numpy ufuncs corresponding to the operators"
+
+
+def release(obj, reuse=False, stats=None, **kwargs):
+    """
+    Computes obj evaluating the graph in topological order (as iterative)
+    and dropping the value of each node as soon as all the nodes depending
+    on it have been evaluated. The values already in the given cache
+    are kept.
+
+    Parameters
+    ----------
+    reuse: bool
+        Whether the arrays of the dropped values are reused as output of the
+        numpy ufuncs (or the equivalent operators) of their last consumer.
+        An array is reused only if it has been created by a ufunc of the graph,
+        it has not been passed to functions other than ufuncs (that could keep
+        a reference to it) and it has the shape and dtype of the result.
+    stats: dict
+        If given, it is filled with the memory statistics (see sizeof):
+        - peak: the peak of the bytes held by the values of the nodes
+        - total: the bytes of all the values, i.e. the peak without releasing
+        - reused: the number of arrays reused
+    """
+    if isinstance(obj, Node):
+        kwargs.setdefault("graph", Node(obj).graph)
+    if "graph" not in kwargs:
+        return compute(obj, **kwargs)
+
+    roots = roots_of(obj)
+    schedule = Schedule(kwargs["graph"], roots)
+    kwargs = schedule.prepare(**kwargs)
+    cache = kwargs["cache"]
+    keep = set(roots).union(cache)
+    remaining = [len(consumers) for consumers in schedule.consumers]
+    sizes = [0] * len(schedule)
+    # whether the value is an array only referenced by the cache
+    owned = [False] * len(schedule)
+    live = peak = total = reused = 0
+
+    for idx, key in enumerate(schedule.keys):
+        fnc = args = donor = None
+        if reuse and key not in cache:
+            fnc, args = ufunc_call(schedule.graph.backend[key], cache)
+        if args is not None:
+            donor = inplace(schedule, idx, fnc, args, cache, keep, remaining, owned)
+        if donor is not None:
+            # the array of the donor now holds the value of the node
+            reused += 1
+            live -= sizes[donor]
+            sizes[donor] = 0
+        value = schedule.evaluate(idx, **kwargs)
+        if reuse:
+            # a ufunc of numbers returns a new array, while other functions
+            # may keep a reference to their arguments
+            owned[idx] = (
+                args is not None and type(value) is numpy.ndarray and value.base is None
+            )
+            if args is None:
+                for dep in schedule.deps[idx]:
+                    owned[dep] = False
+        sizes[idx] = sizeof(value)
+        total += sizes[idx]
+        live += sizes[idx]
+        peak = max(peak, live)
+        for dep in schedule.deps[idx]:
+            remaining[dep] -= 1
+            if not remaining[dep] and schedule.keys[dep] not in keep:
+                cache.discard((schedule.keys[dep],))
+                live -= sizes[dep]
+
+    if stats is not None:
+        stats["peak"] = peak
+        stats["total"] = total
+        stats["reused"] = reused
+
+    return compute(obj, **kwargs)
+
+
+def ufunc_call(value, cache):
+    """
+    Returns the numpy ufunc computing the node value and the list of its
+    arguments, if they are all numbers or arrays, otherwise (None, None)
+    """
+    if not isinstance(value, Function) or value.kwargs or value.deps:
+        return None, None
+    fnc = value.fnc
+    if not isinstance(fnc, numpy.ufunc):
+        fnc = ufuncs.get(fnc) if not isinstance(fnc, Key) else None
+    if fnc is None or fnc.nout != 1 or fnc.nin != len(value.args):
+        return None, None
+
+    keys = [Key(arg).key if isinstance(arg, Key) else None for arg in value.args]
+    if any(key is not None and key not in cache for key in keys):
+        return None, None
+    args = [arg if key is None else cache[key] for arg, key in zip(value.args, keys)]
+    numbers = (numpy.ndarray, numpy.generic, int, float, complex)
+    if not all(isinstance(arg, numbers) for arg in args):
+        return None, None
+    return fnc, args
+
+
+def inplace(schedule, idx, fnc, args, cache, keep, remaining, owned):
+    """
+    Evaluates the node at position idx, that is fnc(*args) with fnc a ufunc,
+    writing the result in the array of one of its arguments, if it is owned
+    and this is the last use. Returns the position of the node whose array
+    has been reused or None.
+    """
+    value = schedule.graph.backend[schedule.keys[idx]]
+    keys = [Key(arg).key if isinstance(arg, Key) else None for arg in value.args]
+    for pos, key in enumerate(keys):
+        arg = args[pos]
+        if (
+            key is None
+            or key in keep
+            or not owned[schedule.index[key]]
+            or remaining[schedule.index[key]] != 1
+            or type(arg) is not numpy.ndarray
+            or not arg.flags.writeable
+        ):
+            continue
+        try:
+            if arg.shape != numpy.broadcast(*args).shape:
+                continue
+            result = fnc(*args, out=arg)
+        except (TypeError, ValueError):
+            continue
+        cache.set_value(schedule.keys[idx], lambda: result)
+        return schedule.index[key]
+    return None
+
+
+def compile_graph(graph, root):
+    """
+    Compiles the computation of the node root into a Python function
+    without arguments, e.g. for timing it with negligible overhead.
+
+    The function evaluates the nodes in topological order, each only once
+    (as the iterative executor), calling directly the functions of the graph
+    with the values of their arguments held in local variables.
+    The variables are replaced by their current value (the default one
+    if not fixed): changes done after compiling are not seen.
+    The generated code is given by the attribute source of the function.
+    """
+    graph = Graph(graph)
+    root = Key(root).key if isinstance(root, Key) else root
+    schedule = Schedule(graph, root)
+    backend = graph.backend
+    plain = set()
+
+    def resolve(obj, maxiter=2):
+        "Computes the objects that need further evaluation (e.g. tunables)"
+        if isinstance(obj, Key) or hasattr(type(obj), "__compute__"):
+            return compute(obj, graph=graph, maxiter=maxiter)
+        plain.add(type(obj))
+        return obj
+
+    namespace = dict(resolve=resolve, plain=plain, result=Function.result)
+
+    def expr(obj):
+        "Returns the expression of obj: a local variable or a constant"
+        if isinstance(obj, Key) and Key(obj).key in schedule.index:
+            return "v%d" % schedule.index[Key(obj).key]
+        name = "c%d" % len(namespace)
+        namespace[name] = obj
+        if isinstance(obj, Key) or hasattr(type(obj), "__compute__"):
+            return "resolve(%s, 3)" % name
+        return name
+
+    lines = ["def compiled():"]
+    for idx, key in enumerate(schedule.keys):
+        value = backend[key]
+        var = "v%d" % idx
+        if isinstance(value, Variable):
+            lines.append(
+                "    %s = %s"
+                % (var, expr(value.value if value.fixed else value.default))
+            )
+        elif isinstance(value, Function):
+            fnc = expr(value.obj)
+            args = [expr(arg) for arg in value.args]
+            kwargs = ", ".join(
+                "%r: %s" % (name, expr(arg)) for name, arg in value.kwargs.items()
+            )
+            call = args + (["**{%s}" % kwargs] if kwargs else [])
+            lines += [
+                "    %s = %s(%s)" % (var, fnc, ", ".join(call)),
+                "    if %s is None:" % var,
+                "        %s = result(%s, (%s), None)"
+                % (var, fnc, "".join(arg + ", " for arg in args)[:-1]),
+                "    if type(%s) not in plain:" % var,
+                "        %s = resolve(%s)" % (var, var),
+            ]
+        elif isinstance(value, Object):
+            lines.append("    %s = %s" % (var, expr(value.obj)))
+        else:
+            lines.append("    %s = %s" % (var, expr(value)))
+    lines.append("    return v%d" % schedule.index[root])
+
+    source = "\n".join(lines)
+    # pylint: disable=W0122
+    exec(compile(source, "<compiled %s>" % root, "exec"), namespace)
+    compiled = namespace["compiled"]
+    compiled.source = source
+    return compiled
+
+
+executors = {
+    "iterative": iterative,
+    "threads": threads,
+    "release": release,
+}
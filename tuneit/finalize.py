@@ -6,9 +6,13 @@ __all__ = [
     "finalize",
 ]
 
-from .graph import Node, Key
+from dataclasses import replace
+from .graph import Graph, Node, Key, GraphStore, key_parts
+from .hashing import tokenize
 from .variable import Variable
-from .tunable import Object, Function, compute
+from .tunable import Object, Function, Cache, compute
+from .executor import compile_graph, acompute
+from . import tracing
 
 
 def finalize(tunable):
@@ -24,15 +28,23 @@ class HighLevel(Node):
     @property
     def variables(self):
         "List of dependencies that are a variable"
-        return tuple(
-            str(dep) for dep in self.dependencies if isinstance(self[dep], Variable)
+        return self.graph.backend.memoize(
+            ("variables", Key(self).key),
+            lambda: tuple(
+                str(dep)
+                for dep in self.dependencies
+                if isinstance(self[dep], Variable)
+            ),
         )
 
     @property
     def functions(self):
         "List of dependencies that are a functions"
-        return tuple(
-            dep for dep in self.dependencies if isinstance(self[dep], Function)
+        return self.graph.backend.memoize(
+            ("functions", Key(self).key),
+            lambda: tuple(
+                dep for dep in self.dependencies if isinstance(self[dep], Function)
+            ),
         )
 
     @property
@@ -48,7 +60,7 @@ class HighLevel(Node):
     def depends_on(self, value):
         "Returns true if the given value is in the graph"
         if isinstance(value, Key):
-            return Key(value).key in self.dependencies
+            return super().depends_on(value)
         if isinstance(value, Object):
             return self.depends_on(value.key)
         return False
@@ -101,9 +113,178 @@ class HighLevel(Node):
 
     def fix(self, variable, value=None):
         "Fixes the value of the variable"
-        self.get_variable(variable).fix(value)
+        variable = self.get_variable(variable)
+        variable.fix(value)
+        # updates the index of the graph if the value is a dependency
+        self[variable.key] = variable
+
+    def optimize(self):
+        """
+        Optimizes the graph of the node in place.
+
+        - Merges the calls to the same pure function with the same arguments
+          (common-subexpression elimination), e.g. the ones that differ by uid.
+        - Removes the nodes that the node does not depend on.
+
+        The graph is replaced by a new one, thus other nodes sharing
+        the original graph are not affected.
+
+        Returns
+        -------
+        A dictionary with the number of nodes "before" and "after" the
+        optimization and the number of nodes "merged" and "pruned".
+        """
+        backend = self.graph.backend
+        before = len(backend)
+        renamed = {}
+        calls = {}
+        data = {}
+        for key in backend.topological(Key(self).key):
+            value = substitute(backend[key], renamed)
+            if isinstance(value, Function) and value.pure:
+                call = tokenize(
+                    type(value).__name__,
+                    value.label,
+                    value.obj,
+                    value.deps,
+                    value.args,
+                    value.kwargs,
+                )
+                if call in calls:
+                    renamed[key] = calls[call]
+                    continue
+                calls[call] = key
+            data[key] = value
+
+        # values that cannot be rewritten still refer to the merged nodes
+        todo = list(data)
+        while todo:
+            for dep in key_parts(data[todo.pop()]):
+                if dep not in data and dep in backend:
+                    data[dep] = backend[dep]
+                    todo.append(dep)
+
+        self.graph.backend = GraphStore(data)
+        merged = sum(1 for key in renamed if key not in data)
+        return dict(
+            before=before,
+            after=len(data),
+            merged=merged,
+            pruned=before - len(data) - merged,
+        )
+
+    def fold(self, **kwargs):
+        """
+        Evaluates once the functions that do not depend on tunable variables
+        (constant folding) and replaces them in the graph by Object leaves
+        holding the result. Fixed variables are considered constants.
+
+        Calls to impure functions (see tunable.impure) and the nodes that
+        depend on them are not folded.
+        The graph is replaced by a new one, thus other nodes sharing
+        the original graph are not affected.
+
+        Parameters
+        ----------
+        kwargs: dict
+            Options passed to compute, e.g. executor. See help(compute).
+
+        Returns
+        -------
+        A dictionary with the number of nodes "before" and "after" the
+        folding and the number of nodes "folded".
+        """
+        backend = self.graph.backend
+        root = Key(self).key
+        constant = set()
+        for key in backend.topological(root):
+            value = backend[key]
+            if isinstance(value, Variable):
+                if value.fixed:
+                    constant.add(key)
+            elif (not isinstance(value, Function) or value.pure) and all(
+                dep in constant for dep in backend.dependencies(key)
+            ):
+                constant.add(key)
+
+        # the largest constant subgraphs: the ones used by non-constant nodes
+        used = {root}
+        for key in backend.topological(root):
+            if key not in constant:
+                used.update(backend.dependencies(key))
+        folded = [
+            key
+            for key in backend.topological(root)
+            if key in constant
+            and key in used
+            and isinstance(backend[key], Object)
+            and (isinstance(backend[key], Function) or backend[key].deps)
+        ]
+
+        store = backend.copy()
+        if kwargs.get("cache", True) is True:
+            kwargs["cache"] = Cache()
+        kwargs["graph"] = Graph(store)
+        for key in folded:
+            result = compute(Key(key), **kwargs)
+            store[key] = Object(result, label=backend[key].label)
+
+        self.graph.backend = GraphStore(
+            {key: store[key] for key in store.topological(root)}
+        )
+        return dict(
+            before=len(backend),
+            after=len(self.graph.backend),
+            folded=len(folded),
+        )
+
+    def compile(self):
+        """
+        Returns a function without arguments that computes the result of the Node
+        with the current values of the variables and negligible overhead.
+        For more details see help(compile_graph).
+        """
+        return compile_graph(self.graph, Key(self).key)
+
+    async def acompute(self, **kwargs):
+        """
+        Computes the result of the Node awaiting the coroutine functions.
+        For the list of options see help(acompute).
+        """
+        kwargs.setdefault("graph", self.graph)
+        return await acompute(self.value, **kwargs)
 
     def compute(self, **kwargs):
-        "Computes the result of the Node"
+        """
+        Computes the result of the Node.
+        For the list of options see help(compute), e.g. cache=True
+        evaluates each node of the graph only once.
+        """
         kwargs.setdefault("graph", self.graph)
+        tracer = tracing.current
+        if tracer is not None:
+            return tracer.record(Key(self).key, compute, self.value, **kwargs)
         return compute(self.value, **kwargs)
+
+
+def substitute(value, renamed):
+    "Returns the value with the keys in renamed replaced by the new keys"
+    if not renamed or not any(key in renamed for key in key_parts(value)):
+        return value
+    if not isinstance(value, Object) or isinstance(value, Variable):
+        return value
+
+    def sub(obj):
+        if isinstance(obj, Key):
+            key = Key(obj).key
+            return Key(renamed[key]) if key in renamed else obj
+        if type(obj) is tuple:
+            return tuple(map(sub, obj))
+        if type(obj) is dict:
+            return {key: sub(val) for key, val in obj.items()}
+        return obj
+
+    fields = dict(obj=sub(value.obj), deps=sub(value.deps))
+    if isinstance(value, Function):
+        fields.update(args=sub(value.args), kwargs=sub(value.kwargs))
+    return replace(value, **fields)
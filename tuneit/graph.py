@@ -7,10 +7,287 @@ __all__ = [
 ]
 
 from collections import deque
-from collections.abc import Iterable
+from collections.abc import Iterable, MutableMapping
+from threading import Lock
 from .meta import CastableType
 
 
+class GraphStore(MutableMapping):
+    """
+    Dictionary used as backend of the graphs.
+
+    Copies and joins share the content of the original stores instead of
+    copying it. The content is kept in immutable layers: a store has its own
+    entries and a tuple of parent layers, whose content is overridden by the
+    later parents and by the own entries. Reading a key not in the few most
+    recent layers flattens the store into a single dictionary.
+
+    Copying a store or joining it into another one costs O(1).
+
+    The dependency queries (dependencies, closure, topological, consumers)
+    are cached in a GraphIndex that is shared by the copies and invalidated
+    when a mutation adds a key or changes the structure of the graph.
+
+    The stores derived from each other by copies and joins share a set with
+    all the keys they stored, such that lookups of new keys are quickly
+    not found. The set is released with the stores.
+    """
+
+    # Number of layers searched before flattening the store
+    search_limit = 16
+
+    _lock = Lock()
+
+    def __init__(self, data=None):
+        self._own = {}
+        self._parents = ()
+        self._index = None
+        if isinstance(data, GraphStore):
+            self._parents = data.layers()
+            self._index = data.index
+            self._keys = data._keys
+        else:
+            self._keys = set()
+            if data is not None:
+                self.update(data)
+
+    def layers(self):
+        "Returns the immutable layers with the current content of the store"
+        if self._own:
+            layer = GraphStore()
+            layer._own, layer._parents = self._own, self._parents
+            layer._keys = self._keys
+            self._own, self._parents = {}, (layer,)
+        return self._parents
+
+    def join(self, other):
+        "Adds the content of the other store overriding the existing keys"
+        if self._own:
+            self.layers()
+        self._index = None
+        with self._lock:
+            # the smaller set of keys is merged into the larger one
+            keys, other_keys = self._keys, other._keys
+            if keys is not other_keys:
+                if len(keys) < len(other_keys):
+                    keys, other_keys = other_keys, keys
+                keys.update(other_keys)
+                self._keys = keys
+        # the layers of other take precedence also if already in the parents
+        layers = other.layers()
+        ids = set(map(id, layers))
+        self._parents = (
+            tuple(layer for layer in self._parents if id(layer) not in ids) + layers
+        )
+
+    def flatten(self):
+        "Merges all the layers into the own entries"
+        if not self._parents:
+            return
+        with self._lock:
+            if not self._parents:
+                return
+            data = {}
+            for store in reversed(list(self._precedence())):
+                data.update(store._own)
+            self._own = data
+            self._parents = ()
+
+    def _precedence(self):
+        """
+        Iterates over the store and its layers from the one with the highest
+        precedence, as if their content was added in order with dict.update
+        """
+        seen = set()
+        stack = [self]
+        while stack:
+            store = stack.pop()
+            if id(store) not in seen:
+                seen.add(id(store))
+                yield store
+                stack.extend(store._parents)
+
+    def _find(self, key):
+        "Returns the store that contains key (searching only the recent layers)"
+        if key in self._own:
+            return self
+        if not self._parents or key not in self._keys:
+            return None
+        for num, store in enumerate(self._precedence()):
+            if key in store._own:
+                return store
+            if num == self.search_limit:
+                break
+        else:
+            return None
+        self.flatten()
+        return self if key in self._own else None
+
+    def __getitem__(self, key):
+        try:
+            return self._own[key]
+        except KeyError:
+            store = self._find(key)
+            if store is None:
+                raise
+            return store._own[key]
+
+    def __setitem__(self, key, value):
+        index = self._index
+        if index is not None:
+            # The index is kept if the structure of the graph does not change
+            if key not in self:
+                self._index = None
+            elif key in index.deps and (
+                type(self[key]) is not type(value)
+                or key_parts(value) != index.deps[key]
+            ):
+                self._index = None
+        self._keys.add(key)
+        self._own[key] = value
+
+    def __delitem__(self, key):
+        self.flatten()
+        del self._own[key]
+        self._index = None
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __iter__(self):
+        self.flatten()
+        return iter(self._own)
+
+    def __len__(self):
+        self.flatten()
+        return len(self._own)
+
+    def copy(self):
+        "Shallow copy of the store"
+        return GraphStore(self)
+
+    @property
+    def index(self):
+        "The GraphIndex of the store"
+        if self._index is None:
+            self._index = GraphIndex()
+        return self._index
+
+    def dependencies(self, key):
+        "Keys of the direct dependencies of the node (with repetitions)"
+        deps = self.index.deps
+        if key not in deps:
+            deps[key] = key_parts(self[key]) if key in self else ()
+        return deps[key]
+
+    def closure(self, key):
+        "Keys of all the dependencies of the node, itself included, in depth-first order"
+        closure = self.index.closure
+        if key not in closure:
+            order = []
+            seen = set()
+            stack = [key]
+            while stack:
+                dep = stack.pop()
+                if dep not in seen:
+                    seen.add(dep)
+                    order.append(dep)
+                    stack.extend(reversed(self.dependencies(dep)))
+            closure[key] = tuple(order)
+        return closure[key]
+
+    def depends_on(self, key, dep):
+        "Whether the node key depends on dep"
+        memo = self.index.memo
+        if ("closure", key) not in memo:
+            memo["closure", key] = frozenset(self.closure(key))
+        return dep in memo["closure", key]
+
+    def topological(self, key):
+        "Keys of the closure of the node in topological order (dependencies first)"
+        topological = self.index.topological
+        if key not in topological:
+            order = []
+            done = set()
+            stack = [(key, iter(self.dependencies(key)))]
+            visiting = {key}
+            while stack:
+                node, deps = stack[-1]
+                for dep in deps:
+                    if dep not in done and dep not in visiting and dep in self:
+                        visiting.add(dep)
+                        stack.append((dep, iter(self.dependencies(dep))))
+                        break
+                else:
+                    stack.pop()
+                    done.add(node)
+                    order.append(node)
+            topological[key] = tuple(order)
+        return topological[key]
+
+    def consumers(self, key):
+        "Keys of the nodes of the store that depend directly on the node"
+        index = self.index
+        if index.consumers is None:
+            consumers = {}
+            for node in self:
+                for dep in set(self.dependencies(node)):
+                    consumers.setdefault(dep, []).append(node)
+            index.consumers = {key: tuple(val) for key, val in consumers.items()}
+        return index.consumers.get(key, ())
+
+    def downstream(self, key):
+        "Keys of the nodes of the store that depend on the node, itself included"
+        memo = self.index.memo
+        if ("downstream", key) not in memo:
+            seen = {key}
+            todo = [key]
+            while todo:
+                for node in self.consumers(todo.pop()):
+                    if node not in seen:
+                        seen.add(node)
+                        todo.append(node)
+            memo["downstream", key] = frozenset(seen)
+        return memo["downstream", key]
+
+    def memoize(self, key, fnc):
+        "Returns fnc() caching the result in the index under key"
+        memo = self.index.memo
+        if key not in memo:
+            memo[key] = fnc()
+        return memo[key]
+
+    def __reduce__(self):
+        return GraphStore, (dict(self),)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class GraphIndex:
+    "Cached dependency queries of a GraphStore"
+
+    def __init__(self):
+        self.deps = {}
+        self.closure = {}
+        self.topological = {}
+        self.consumers = None
+        self.memo = {}
+
+
+def parts(value):
+    "Iterates over the parts of a node value (as Node.__iter__)"
+    try:
+        yield from value
+    except TypeError:
+        yield value
+
+
+def key_parts(value):
+    "Returns the keys in the parts of a node value"
+    return tuple(Key(part).key for part in parts(value) if isinstance(part, Key))
+
+
 class Graph(metaclass=CastableType, attrs=["backend"]):
     """
     A Graph class.
@@ -19,7 +296,7 @@ class Graph(metaclass=CastableType, attrs=["backend"]):
     def __init__(self, graph=None):
         if isinstance(graph, Graph):
             graph = graph.backend
-        self.backend = {} if graph is None else dict(graph)
+        self.backend = GraphStore(graph)
 
     def __getitem__(self, key):
         if isinstance(key, Key):
@@ -39,6 +316,9 @@ class Graph(metaclass=CastableType, attrs=["backend"]):
         del self.backend[key]
 
     def __getattr__(self, key):
+        if key.startswith("__"):
+            # e.g. __setstate__ while unpickling
+            raise AttributeError(key)
         return getattr(self.backend, key)
 
     def __contains__(self, key):
@@ -71,11 +351,13 @@ class Graph(metaclass=CastableType, attrs=["backend"]):
         "Updates the content of the dictionary"
         if isinstance(value, Graph):
             value = Graph(value).backend
+        if isinstance(value, GraphStore):
+            return self.backend.join(value)
         return self.backend.update(value)
 
     def copy(self):
         "Shallow copy of a Graph"
-        return Graph(self.backend.copy())
+        return Graph(self.backend)
 
 
 class Key(metaclass=CastableType, attrs=["key"]):
@@ -98,6 +380,8 @@ class Key(metaclass=CastableType, attrs=["key"]):
         return self.key == value
 
     def __getattr__(self, key):
+        if key.startswith("__"):
+            raise AttributeError(key)
         return getattr(self.key, key)
 
     def __hash__(self):
@@ -191,24 +475,21 @@ class Node(Graph, Key, bind=False):
 
     @property
     def first_dependencies(self):
-        "Iterates over the dependencies"
-        for val in self:
-            if isinstance(val, Key):
-                yield Key(val)
+        "Iterates over the direct dependencies"
+        for dep in self.graph.backend.dependencies(Key(self).key):
+            yield Key(dep)
 
     @property
     def dependencies(self):
-        "Iterates over the dependencies"
-        deps = [self.key]
-        yield deps[0]
-        for val in self:
-            if isinstance(val, Key):
-                val = self.graph[val]
-            if isinstance(val, Node):
-                for dep in Node(val).dependencies:
-                    if dep not in deps:
-                        deps.append(dep)
-                        yield dep
+        "Iterates over the dependencies, the node included"
+        for dep in self.graph.backend.closure(Key(self).key):
+            yield Key(dep)
+
+    def depends_on(self, value):
+        "Returns true if the given key is a dependency of the node"
+        if isinstance(value, Key):
+            value = Key(value).key
+        return self.graph.backend.depends_on(Key(self).key, value)
 
     def visualize(self, **kwargs):
         """
@@ -239,45 +520,190 @@ def join_graphs(graphs):
     return Graph()
 
 
-def visualize(graph, start=None, end=None, **kwargs):
-    "Visualizes the graph returning a dot graph"
+def visualize(
+    graph, start=None, end=None, max_nodes=None, collapse=False, filename=None, **kwargs
+):
+    """
+    Visualizes the graph returning a dot graph
+
+    Parameters
+    ----------
+    start: Key
+        If given, only the nodes depending on start are shown.
+    end: Key
+        If given, only the dependencies of end are shown.
+    max_nodes: int
+        Maximum number of nodes shown. The nodes closer to end are kept and
+        the others are replaced by a single node.
+    collapse: bool
+        Whether repeated subgraphs (nodes with the same label and the same
+        structure of dependencies) are shown once, labeled with the repetitions.
+    filename: str
+        If given, the DOT source is written to filename instead of creating
+        a graphviz.Digraph, and filename is returned.
+    kwargs: dict
+        Arguments of graphviz.Digraph, e.g. graph_attr.
+    """
     assert isinstance(graph, Graph), "graph must be of type Graph"
 
     if isinstance(graph, Node):
         end = end or Node(graph).key
 
     graph = Graph(graph)
+    backend = graph.backend
 
     if end is not None:
         if end not in graph:
             raise KeyError("Given end %s not in graph" % end)
-        end = graph[end]
-        keys = tuple(end.dependencies)
+        end = Key(end).key if isinstance(end, Key) else end
+        keys = backend.closure(end)
     else:
-        keys = tuple(graph.keys())
+        keys = tuple(backend.keys())
+
+    if start is not None:
+        start = Key(start).key if isinstance(start, Key) else start
+        if start not in keys:
+            raise KeyError("Given start %s not in graph" % start)
+        reachable = backend.downstream(start)
+        keys = tuple(key for key in keys if key in reachable)
 
-    if isinstance(start, Node):
-        start = Node(start).key
+    nodes, edges = graph_items(graph, keys, max_nodes=max_nodes, collapse=collapse)
 
-    if start and start not in keys:
-        raise KeyError("Given start %s not in graph" % end)
+    if filename is not None:
+        with open(filename, "w") as out:
+            out.writelines(dot_lines(nodes, edges, **kwargs))
+        return filename
 
     dot = default_graph(**kwargs)
+    for name, label, attrs in nodes:
+        dot.node(name, label, **attrs)
+    for tail, head, attrs in edges:
+        dot.edge(tail, head, **attrs)
+    return dot
 
-    for key in keys:
-        node = graph[key]
 
-        if start and start not in node.dependencies:
+def graph_items(graph, keys, max_nodes=None, collapse=False):
+    """
+    Returns the nodes (name, label, attrs) and the edges (tail, head, attrs)
+    for drawing the given keys of the graph. See help(visualize).
+    """
+    backend = graph.backend
+    selected = set(keys)
+    deps = {
+        key: tuple(dep for dep in backend.dependencies(key) if dep in selected)
+        for key in keys
+    }
+
+    names = {key: str(key) for key in keys}
+    if collapse:
+        ids = {}
+        for key, sig in signatures(graph, keys).items():
+            names[key] = ids.setdefault(sig, names[key])
+
+    counts = {}
+    for key in by_distance(keys, deps) if max_nodes is not None else keys:
+        counts[names[key]] = counts.get(names[key], 0) + 1
+
+    hidden = set()
+    if max_nodes is not None and len(counts) > max_nodes:
+        hidden = set(tuple(counts)[max(max_nodes - 1, 0) :])
+
+    nodes = []
+    drawn = set()
+    for key in keys:
+        name = names[key]
+        if name in drawn or name in hidden:
             continue
+        drawn.add(name)
+        node = graph[key]
+        label = node.label
+        if counts[name] > 1:
+            label = "%s x%d" % (label, counts[name])
+        nodes.append((name, label, node.dot_attrs))
+    if hidden:
+        nodes.append(("...", "%d more nodes" % len(hidden), dict(shape="plaintext")))
+
+    edges = {}
+    for key in keys:
+        for dep in deps[key]:
+            tail, head = names[dep], names[key]
+            if tail in hidden and head in hidden:
+                continue
+            attrs = {}
+            if tail in hidden or head in hidden:
+                attrs = dict(style="dashed")
+                tail = "..." if tail in hidden else tail
+                head = "..." if head in hidden else head
+            edges.setdefault((tail, head), attrs)
+    return nodes, [(tail, head, attrs) for (tail, head), attrs in edges.items()]
 
-        dot.node(str(key), node.label, **node.dot_attrs)
 
-        for dep in node.first_dependencies:
-            if start and start not in graph[dep].dependencies:
+def signatures(graph, keys):
+    """
+    Returns a structural signature of the keys. Nodes have the same signature
+    if they have the same label and their dependencies have the same signatures.
+    """
+    backend = graph.backend
+    ids = {}
+    sigs = {}
+    for root in keys:
+        stack = [root]
+        while stack:
+            key = stack[-1]
+            if key in sigs:
+                stack.pop()
                 continue
-            dot.edge(str(dep), str(key))
-
-    return dot
+            deps = backend.dependencies(key)
+            missing = [dep for dep in deps if dep not in sigs and dep in backend]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            sig = (graph[key].label, tuple(sigs.get(dep, dep) for dep in deps))
+            sigs[key] = ids.setdefault(sig, len(ids))
+    return {key: sigs[key] for key in keys}
+
+
+def by_distance(keys, deps):
+    "Returns the keys ordered by distance from the nodes that are not dependencies"
+    consumed = set(dep for key in keys for dep in deps[key])
+    order = [key for key in keys if key not in consumed]
+    seen = set(order)
+    for key in order:
+        for dep in deps[key]:
+            if dep not in seen:
+                seen.add(dep)
+                order.append(dep)
+    return order
+
+
+def dot_lines(nodes, edges, name=None, graph_attr=None, node_attr=None, **kwargs):
+    "Iterates over the lines of the DOT source of the given nodes and edges"
+    # pylint: disable=W0613
+    graph_attr = dict(graph_attr or {})
+    graph_attr.setdefault("rankdir", "LR")
+
+    yield "digraph %s{\n" % (quote(name) + " " if name else "")
+    yield "\tgraph%s\n" % attributes(graph_attr)
+    if node_attr:
+        yield "\tnode%s\n" % attributes(node_attr)
+    for node, label, attrs in nodes:
+        yield "\t%s%s\n" % (quote(node), attributes(dict(attrs, label=label)))
+    for tail, head, attrs in edges:
+        yield "\t%s -> %s%s\n" % (quote(tail), quote(head), attributes(attrs))
+    yield "}\n"
+
+
+def quote(value):
+    "Quotes a DOT identifier"
+    return '"%s"' % str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def attributes(attrs):
+    "Formats DOT attributes"
+    if not attrs:
+        return ""
+    return " [%s]" % " ".join("%s=%s" % (key, quote(val)) for key, val in attrs.items())
 
 
 def default_graph(**kwargs):
@@ -0,0 +1,158 @@
+"""
+Hashing of the content of the nodes used for their keys.
+
+The keys are Merkle-like: the dependencies are represented by their key,
+while the other objects are reduced to a cheap fingerprint by normalize.
+The normalization can be extended for new types with register.
+"""
+# pylint: disable=C0303,C0330
+
+__all__ = [
+    "tokenize",
+    "normalize",
+    "register",
+]
+
+from functools import partial
+from hashlib import blake2b, md5
+from itertools import count
+from types import BuiltinFunctionType, FunctionType, ModuleType
+from weakref import finalize
+from dill import dumps
+import numpy
+from .graph import Key
+
+try:
+    from xxhash import xxh3_128 as fast_hash
+except ImportError:
+    fast_hash = partial(blake2b, digest_size=16)
+
+LARGE_BUFFER = 2 ** 22
+"Size in bytes above which buffers are identified by identity instead of content"
+
+ATOMIC = (type(None), bool, int, float, complex, str, bytes)
+
+normalizers = {}
+
+_IDS = {}
+_COUNTER = count()
+
+
+def register(*types):
+    """
+    Decorator that registers the normalization of the given types.
+    The function should return a hashable token of the object that is equal
+    for objects that should have the same key.
+    """
+
+    def decorator(fnc):
+        for typ in types:
+            normalizers[typ] = fnc
+        return fnc
+
+    return decorator
+
+
+def normalize(obj):
+    "Returns a token of the object made of atomic types and tuples"
+    if type(obj) in ATOMIC:
+        return obj
+    if isinstance(obj, Key):
+        return ("Key", Key(obj).key if type(obj) is not Key else obj.key)
+    for typ in type(obj).__mro__:
+        if typ in normalizers:
+            return normalizers[typ](obj)
+    return normalize_object(obj)
+
+
+def tokenize(*objs):
+    "Returns a hexadecimal hash of the objects"
+    return fast_hash(repr(normalize(objs)).encode()).hexdigest()
+
+
+def identity(obj):
+    """
+    Returns a token of the identity of obj.
+    The token is kept as long as the object exists and it is never reused.
+    """
+    key = id(obj)
+    if key not in _IDS:
+        finalize(obj, _IDS.pop, key, None)
+        _IDS[key] = ("id", type(obj).__name__, next(_COUNTER))
+    return _IDS[key]
+
+
+def cached(obj, fnc):
+    "Returns fnc(obj) caching the result while obj exists"
+    key = id(obj)
+    if key not in _IDS:
+        token = fnc(obj)
+        finalize(obj, _IDS.pop, key, None)
+        _IDS[key] = token
+    return _IDS[key]
+
+
+def pickled(obj):
+    "Token of the pickled object"
+    return (type(obj).__name__, md5(dumps(obj)).hexdigest())
+
+
+def normalize_object(obj):
+    """
+    Token of a generic object made from its pickle.
+    If the object cannot be pickled, its identity is used.
+    """
+    try:
+        return pickled(obj)
+    except Exception as _:
+        return identity(obj)
+
+
+@register(tuple, list)
+def normalize_sequence(obj):
+    "Token of tuples and lists"
+    return (type(obj).__name__,) + tuple(map(normalize, obj))
+
+
+@register(dict)
+def normalize_dict(obj):
+    "Token of dictionaries"
+    return ("dict",) + tuple(
+        (normalize(key), normalize(val)) for key, val in obj.items()
+    )
+
+
+@register(set, frozenset)
+def normalize_set(obj):
+    "Token of sets"
+    return (type(obj).__name__,) + tuple(sorted(map(repr, map(normalize, obj))))
+
+
+@register(FunctionType, BuiltinFunctionType, ModuleType, type)
+def normalize_callable(obj):
+    "Token of functions and classes cached by identity"
+    try:
+        return cached(obj, normalize_object)
+    except TypeError:
+        # not weakly referenceable
+        return normalize_object(obj)
+
+
+@register(numpy.ndarray)
+def normalize_array(obj):
+    """
+    Token of arrays made from the hash of their buffer.
+    Arrays larger than LARGE_BUFFER are identified by identity.
+    """
+    if obj.dtype.hasobject:
+        return normalize_object(obj)
+    if obj.nbytes > LARGE_BUFFER:
+        return identity(obj)
+    data = numpy.ascontiguousarray(obj).reshape(-1).view(numpy.uint8)
+    return ("ndarray", obj.dtype.str, obj.shape, fast_hash(data).hexdigest())
+
+
+@register(numpy.generic)
+def normalize_scalar(obj):
+    "Token of numpy scalars"
+    return (obj.dtype.str, obj.item())
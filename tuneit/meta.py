@@ -19,7 +19,7 @@ class Slot:
         "Returns the getter function"
 
         def fget(self):
-            return getattr(type(self), "__values__").__get__(self)[key].value
+            return self.__values__[key].value
 
         return fget
 
@@ -28,7 +28,7 @@ class Slot:
         "Returns the setter function"
 
         def fset(self, value):
-            getattr(type(self), "__values__").__get__(self)[key].value = value
+            self.__values__[key].value = value
 
         return fset
 
@@ -71,9 +71,11 @@ class CastableType(type):
         def __cast__(self):
             if not isinstance(self, scls):
                 raise TypeError("Cannot cast %s" % repr(self))
-            for key in tuple(getattr(type(self), "__values__").__get__(self).keys()):
-                if key not in scls.__attrs__:
-                    del getattr(type(self), "__values__").__get__(self)[key]
+            # The values dict can be shared with other views: a new one is used
+            values = self.__values__
+            getattr(type(self), "__values__").__set__(
+                self, {key: values[key] for key in scls.__attrs__ if key in values}
+            )
             object.__setattr__(self, "__class__", scls)
 
         return __cast__
@@ -115,28 +117,31 @@ class CastableType(type):
 
         self = super().__new__(cls, name, tuple(bases), class_attrs)
         self.__cast__ = cls.caster(self)
+        self.__attrset__ = frozenset(class_attrs["__attrs__"])
+        self.__subclass_cache__ = {}
         return self
 
     def __call__(cls, *args, **kwargs):
         "Either calls the class initialization or simply casts"
 
-        args = tuple(args)
-
         # pylint: disable=E1120
         obj = cls.__new__(cls)
         # pylint: enable=E1120
+
+        if len(args) == 1 and isinstance(args[0], cls):
+            # The view shares the values of the original object
+            getattr(cls, "__values__").__set__(obj, args[0].__values__)
+            return obj
+
         values = dict()
         getattr(cls, "__values__").__set__(obj, values)
 
-        if len(args) == 1 and (
-            isinstance(args[0], cls) or issubclass(cls, type(args[0]))
-        ):
+        if len(args) == 1 and issubclass(cls, type(args[0])):
+            # orig can be shared with a larger view: only the attrs of its class
+            orig = args[0].__values__
+            attrs = type(args[0]).__attrset__
             for attr in obj.__attrs__:
-                values[attr] = (
-                    getattr(type(args[0]), "__values__")
-                    .__get__(args[0])
-                    .get(attr, Slot())
-                )
+                values[attr] = orig[attr] if attr in attrs else Slot()
         else:
             for attr in obj.__attrs__:
                 values[attr] = Slot()
@@ -149,10 +154,14 @@ class CastableType(type):
 
     def __subclasscheck__(cls, child):
         "Checks if child is subclass of class"
-        return isinstance(child, CastableType) and set(child.__attrs__).issuperset(
-            cls.__attrs__
-        )
+        try:
+            return cls.__subclass_cache__[child]
+        except KeyError:
+            pass
+        res = isinstance(child, CastableType) and child.__attrset__ >= cls.__attrset__
+        cls.__subclass_cache__[child] = res
+        return res
 
     def __instancecheck__(cls, instance):
         "Checks if instance is instance of cls"
-        return issubclass(type(instance), cls)
+        return cls.__subclasscheck__(type(instance))
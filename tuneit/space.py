@@ -0,0 +1,244 @@
+"""
+Value spaces of the tunable variables.
+A value space has O(1) length, fast membership and random access by index
+without holding the values in memory.
+"""
+# pylint: disable=C0303,C0330
+
+__all__ = [
+    "Space",
+    "Values",
+    "Grid",
+    "LogGrid",
+    "Permutations",
+    "space",
+]
+
+from abc import ABC, abstractmethod
+from collections.abc import Sequence, Hashable
+from itertools import permutations
+from math import factorial, isclose, log
+
+
+def space(values):
+    "Returns a value space for the given values"
+    if isinstance(values, (Space, range)):
+        return values
+    return Values(values)
+
+
+def size_of(values):
+    "Returns the number of values, also when larger than sys.maxsize (unlike len)"
+    if isinstance(values, Space):
+        return values.size
+    if isinstance(values, range):
+        return (values[-1] - values[0]) // values.step + 1 if values else 0
+    return len(values)
+
+
+class Space(Sequence, ABC):
+    "Base class of the value spaces"
+
+    @property
+    @abstractmethod
+    def size(self):
+        "Number of values of the space (len fails above sys.maxsize)"
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self[idx] for idx in range(*index.indices(self.size)))
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("Index %s out of range" % index)
+        return self.get(index)
+
+    @abstractmethod
+    def get(self, index):
+        "Returns the value at the given (valid) index"
+
+    def __contains__(self, value):
+        try:
+            self.index(value)
+            return True
+        except ValueError:
+            return False
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return self.size == size_of(other) and all(
+                val == oth for val, oth in zip(self, other)
+            )
+        return False
+
+    def __hash__(self):
+        return hash(repr(self))
+
+
+class Values(Space):
+    "Space of an explicit list of values"
+
+    def __init__(self, values):
+        self.values = values if isinstance(values, Sequence) else tuple(values)
+        self._index = None
+
+    @property
+    def size(self):
+        return len(self.values)
+
+    def get(self, index):
+        return self.values[index]
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def index(self, value, *args):
+        if self._index is None:
+            self._index = {}
+            for idx, val in enumerate(self.values):
+                if not isinstance(val, Hashable):
+                    self._index = False
+                    break
+                self._index.setdefault(val, idx)
+        if self._index is False or not isinstance(value, Hashable):
+            return self.values.index(value, *args)
+        try:
+            return self._index[value]
+        except KeyError:
+            raise ValueError("%s not in values" % (value,))
+
+    def __repr__(self):
+        return repr(self.values)
+
+
+class Grid(Space):
+    "Space of num evenly spaced numbers from start to stop (as numpy.linspace)"
+
+    def __init__(self, start, stop, num):
+        if num < 1:
+            raise ValueError("num must be positive")
+        self.start = start
+        self.stop = stop
+        self.num = num
+
+    @property
+    def step(self):
+        "Distance between two values"
+        return (self.stop - self.start) / (self.num - 1) if self.num > 1 else 0
+
+    @property
+    def size(self):
+        return self.num
+
+    def get(self, index):
+        if index == self.num - 1:
+            return self.stop
+        return self.start + index * self.step
+
+    def position(self, value):
+        "Approximated (real) position of value in the grid"
+        return (value - self.start) / self.step if self.step else 0
+
+    def index(self, value, *args):
+        try:
+            idx = round(self.position(value))
+        except (TypeError, ValueError, ZeroDivisionError):
+            raise ValueError("%s not in %s" % (value, self))
+        if 0 <= idx < self.num and isclose(self.get(idx), value, abs_tol=1e-12):
+            return idx
+        raise ValueError("%s not in %s" % (value, self))
+
+    def __repr__(self):
+        return "%s(%s, %s, %s)" % (
+            type(self).__name__,
+            self.start,
+            self.stop,
+            self.num,
+        )
+
+
+class LogGrid(Grid):
+    "Space of num numbers evenly spaced on a log scale (as numpy.geomspace)"
+
+    def __init__(self, start, stop, num):
+        if start <= 0 or stop <= 0:
+            raise ValueError("start and stop must be positive")
+        super().__init__(start, stop, num)
+
+    @property
+    def step(self):
+        "Ratio between two values"
+        return (self.stop / self.start) ** (1 / (self.num - 1)) if self.num > 1 else 1
+
+    def get(self, index):
+        if index == self.num - 1:
+            return self.stop
+        return self.start * self.step ** index
+
+    def position(self, value):
+        if self.step == 1:
+            return 0
+        return log(value / self.start) / log(self.step)
+
+
+class Permutations(Space):
+    """
+    Space of the permutations of the given values, in lexicographic order
+    of the positions (as itertools.permutations).
+    The permutations are accessed by unranking their Lehmer code.
+    """
+
+    def __init__(self, values):
+        self.values = tuple(values)
+
+    @property
+    def size(self):
+        return factorial(len(self.values))
+
+    def __iter__(self):
+        return permutations(self.values)
+
+    def get(self, index):
+        return tuple(self.values[pos] for pos in self.positions(index))
+
+    def positions(self, index):
+        "Returns the permutation at index as positions of the original values"
+        pool = list(range(len(self.values)))
+        value = []
+        for num in range(len(pool) - 1, -1, -1):
+            pos, index = divmod(index, factorial(num))
+            value.append(pool.pop(pos))
+        return tuple(value)
+
+    def index(self, value, *args):
+        "Returns the rank of the permutation (Lehmer code)"
+        try:
+            value = tuple(value)
+        except TypeError:
+            raise ValueError("%s is not a permutation" % (value,))
+        if len(value) != len(self.values):
+            raise ValueError("%s is not a permutation" % (value,))
+        pool = list(range(len(self.values)))
+        used = [False] * len(self.values)
+        index = 0
+        for val in value:
+            pos = next(
+                (
+                    pos
+                    for pos, orig in enumerate(self.values)
+                    if not used[pos] and orig == val
+                ),
+                None,
+            )
+            if pos is None:
+                raise ValueError("%s not a permutation of %s" % (value, self.values))
+            used[pos] = True
+            index += pool.index(pos) * factorial(len(pool) - 1)
+            pool.remove(pos)
+        return index
+
+    def __repr__(self):
+        return "Permutations(%s)" % (self.values,)
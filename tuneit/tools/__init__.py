@@ -3,3 +3,7 @@
 from .base import *
 from .check import *
 from .time import *
+from .memory import *
+from .store import *
+from .search import *
+from .pareto import *
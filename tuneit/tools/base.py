@@ -7,12 +7,24 @@ __all__ = [
     "sample",
 ]
 
+import os
+import queue
+import asyncio
 import operator
 import random
-from functools import reduce
+import warnings
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from collections import OrderedDict, deque
+from functools import partial, reduce
 from itertools import product
+from dill import dumps, loads
 from tabulate import tabulate
 from ..finalize import finalize
+from ..tunable import Cache
+from ..executor import Schedule, sizeof
+from .store import TuningStore, stable_keys
 
 
 class Sampler:
@@ -26,12 +38,81 @@ class Sampler:
         callback=None,
         callback_calls=False,
         label=None,
+        workers=None,
+        ordered=True,
+        pin=False,
+        store=None,
+        incremental=False,
+        order=None,
+        max_memory=None,
+        compiled=False,
+        concurrency=1,
         **kwargs,
     ):
-        "Initializes the tunable object and the variables"
+        """
+        Initializes the tunable object and the variables
+
+        Parameters
+        ----------
+        workers: int
+            If given, the samples are evaluated in a pool of processes.
+        ordered: bool
+            Whether the results of the workers are returned in the order of the samples
+            or as soon as they are completed.
+        pin: bool
+            Whether each worker should be pinned to a different core.
+        store: TuningStore or str
+            A persistent store (or its path) where the results are saved.
+            The samples already stored are not evaluated again.
+        incremental: bool
+            Whether the values of the nodes are reused between the samples.
+            Only the nodes depending on the variables that changed from the
+            previous sample are evaluated again. The number of evaluations
+            skipped in the last sweep is given by self.skipped.
+            Note that with callback_calls (e.g. benchmark) the callback is then
+            applied only to the nodes depending on the changed variables.
+        order: str
+            Order of the samples. Options are:
+            - depth: the variables with more nodes depending on them change
+              least often (lexicographic order from the deepest variable).
+            - gray: as depth but in reflected (Gray code) order, such that
+              consecutive samples differ by one step of one variable.
+        max_memory: int
+            If given, the values of the nodes are kept in a LRU table indexed
+            by the values of the variables they depend on, up to max_memory
+            bytes, and reused for any later sample (implies incremental).
+        compiled: bool
+            Whether the samples are computed by a compiled function
+            (see HighLevel.compile) instead of compute. It is not used with
+            incremental or if kwargs for the compute function are given.
+        concurrency: int
+            Number of samples evaluated at the same time when iterating
+            with async for. See help(Sampler.__aiter__).
+        kwargs: dict
+            Variables passed to the compute function. See help(tunable.compute)
+        """
 
         self.tunable = finalize(tunable).copy()
         self.compute_kwargs = kwargs
+        self.workers = workers
+        self.ordered = ordered
+        self.pin = pin
+        if order not in (None, "depth", "gray"):
+            raise ValueError("Unknown order %s. Available: depth, gray" % order)
+        self.order = order
+        self.incremental = incremental or max_memory is not None
+        self.cache = Cache() if self.incremental else None
+        self.lru = PrefixCache(max_memory) if max_memory is not None else None
+        self._last = None
+        self._pool = None
+        self.compiled = compiled
+        self.concurrency = concurrency
+
+        if isinstance(store, str):
+            store = TuningStore(store)
+        self.store = store
+        if store is not None:
+            self.stable_keys = stable_keys(self.tunable)
 
         if callback:
             self.callback = callback
@@ -42,7 +123,7 @@ class Sampler:
 
         if variables:
             self.variables = tuple(
-                str(tunable.get_variable(var).key) for var in variables
+                str(self.tunable.get_variable(var).key) for var in variables
             )
 
             set_vars = set(self.variables)
@@ -80,23 +161,65 @@ class Sampler:
         self._n_samples = min(value, self.max_samples)
 
     def __len__(self):
-        self.n_samples
+        return self.n_samples
 
     @property
     def samples(self):
-        "Samples of the parameters space"
-
-        iters = tuple(self.tunable[var].values for var in self.variables)
-        values = product(*iters)
+        """
+        Samples of the parameters space.
+        It is a lazy iterator; the random samples are drawn by unranking the
+        sampled indices of the parameters space without enumerating it.
+        """
 
         if self.n_samples >= self.max_samples:
-            return tuple(values)
+            if self.order is None:
+                return product(*(self.tunable[var].values for var in self.variables))
+            return map(self.unrank, range(self.max_samples))
 
-        idxs = sorted(random.sample(range(self.max_samples), self.n_samples))
+        try:
+            idxs = random.sample(range(self.max_samples), self.n_samples)
+        except OverflowError:
+            idxs = set()
+            while len(idxs) < self.n_samples:
+                idxs.add(random.randrange(self.max_samples))
 
-        return tuple(
-            val for idx, val in filter(lambda _: _[0] in idxs, enumerate(values))
-        )
+        return map(self.unrank, sorted(idxs))
+
+    @property
+    def nesting(self):
+        """
+        Positions of the variables from the one that changes least often
+        to the one that changes most often in the samples
+        """
+        if self.order is None:
+            return tuple(range(len(self.variables)))
+        if getattr(self, "_nesting", None) is None:
+            weights = tuple(
+                len(self.schedule.downstream([var])) for var in self.variables
+            )
+            self._nesting = tuple(
+                sorted(range(len(self.variables)), key=lambda _: -weights[_])
+            )
+        return self._nesting
+
+    def unrank(self, idx):
+        "Returns the parameters at position idx of the parameters space"
+        nesting = self.nesting
+        variables = tuple(self.tunable[self.variables[pos]] for pos in nesting)
+        digits = []
+        for var in reversed(variables):
+            idx, rest = divmod(idx, var.size)
+            digits.append(rest)
+
+        params = [None] * len(nesting)
+        prefix = 0
+        for pos, var, digit in zip(nesting, variables, reversed(digits)):
+            if self.order == "gray" and prefix % 2:
+                params[pos] = var.get_value(var.size - 1 - digit)
+            else:
+                params[pos] = var.get_value(digit)
+            prefix = prefix * var.size + digit
+        return tuple(params)
 
     def sample_values(self):
         "Returns the sampled values"
@@ -113,20 +236,248 @@ class Sampler:
             raise TypeError("callback must be a callable")
         self._callback = value
 
+    @property
+    def schedule(self):
+        "Schedule of the nodes of the tunable"
+        if getattr(self, "_schedule", None) is None:
+            self._schedule = Schedule(self.tunable.graph, self.tunable.key)
+        return self._schedule
+
+    @property
+    def skipped(self):
+        "Number of node evaluations skipped in the last sweep (incremental mode)"
+        return self.cache.saved if self.cache is not None else 0
+
+    @property
+    def ancestors(self):
+        "Positions of the sampled variables that each node depends on"
+        if getattr(self, "_ancestors", None) is None:
+            position = {var: pos for pos, var in enumerate(self.variables)}
+            ancestors = []
+            for key, deps in zip(self.schedule.keys, self.schedule.deps):
+                anc = {position[key]} if key in position else set()
+                for dep in deps:
+                    anc.update(ancestors[dep])
+                ancestors.append(anc)
+            self._ancestors = {
+                key: tuple(sorted(anc))
+                for key, anc in zip(self.schedule.keys, ancestors)
+            }
+        return self._ancestors
+
+    def entries(self, params):
+        "Returns the entry in the LRU table of each node for the given parameters"
+        idxs = tuple(
+            self.tunable[var].values.index(val)
+            for var, val in zip(self.variables, params)
+        )
+        return {
+            key: (key,) + tuple(idxs[pos] for pos in anc)
+            for key, anc in self.ancestors.items()
+        }
+
+    def reuse(self, params):
+        """
+        Removes from the cache the values of the nodes depending on the variables
+        that changed since the previous sample and returns the cache
+        """
+        if self.lru is not None:
+            self.cache.discard(tuple(self.cache))
+            self.lru.load(self.cache, self.entries(params))
+            return self.cache
+
+        if self._last is None:
+            changed = self.variables
+        else:
+            changed = tuple(
+                var
+                for var, val, last in zip(self.variables, params, self._last)
+                if val is not last and val != last
+            )
+        self.cache.discard(self.schedule.downstream(changed))
+        self._last = params
+        return self.cache
+
+    def compute_cached(self, tunable, cache, params):
+        "Computes the tunable with a copy of the cache that is merged back at the end"
+        run = cache.copy()
+        try:
+            return tunable.compute(cache=run, **self.compute_kwargs)
+        finally:
+            cache.merge(run)
+            if self.lru is not None:
+                self.lru.save(cache, self.entries(params))
+
+    def compute_frozen(self, tunable, cache, params):
+        """
+        Fills the cache computing the tunable once and returns a function that
+        computes the tunable from a copy of the values found in the cache before,
+        such that repeated calls (e.g. timers) evaluate the same nodes
+        and do not change the cache
+        """
+        frozen = cache.copy()
+        self.compute_cached(tunable, cache, params)
+        return lambda: tunable.compute(cache=frozen.copy(), **self.compute_kwargs)
+
+    def evaluate(self, params):
+        "Returns the result for the given parameters"
+        tmp = self.tunable.copy()
+        for var, val in zip(self.variables, params):
+            tmp.fix(var, val)
+
+        if self.incremental:
+            cache = self.reuse(params)
+            compute = partial(self.compute_cached, tmp, cache, params)
+        elif self.compiled and not self.compute_kwargs:
+            compute = tmp.compile()
+        else:
+            compute = partial(tmp.compute, **self.compute_kwargs)
+
+        try:
+            if self.callback_calls:
+                if self.incremental:
+                    compute = self.compute_frozen(tmp, cache, params)
+                return self.callback(compute)
+            return self.callback(compute())
+        except Exception as err:
+            return err
+
+    def start(self):
+        "Resets the counters at the beginning of a sweep"
+        if self.cache is not None:
+            self.cache.reset(values=False)
+
     def __iter__(self):
-        for params in self.samples:
-            tmp = self.tunable.copy()
-            for var, val in zip(self.variables, params):
-                tmp.fix(var, val)
-            try:
-                if self.callback_calls:
-                    result = self.callback(lambda: tmp.compute(**self.compute_kwargs))
-                else:
-                    result = self.callback(tmp.compute(**self.compute_kwargs))
-            except Exception as err:
-                result = err
+        self.start()
+        return self.results(self.samples)
+
+    def results(self, samples):
+        "Iterates over (params, result) of the samples, using the store if given"
+        if self.store is None:
+            yield from self.iterate(samples)
+            return
+
+        key = self.stable_keys[self.tunable.key.key]
+        names = tuple(self.stable_keys[var] for var in self.variables)
+        missing = []
+        for params in samples:
+            found, result = self.store.get(key, self.label, names, params)
+            if found:
+                yield params, result
+            else:
+                missing.append(params)
+
+        for params, result in self.iterate(missing):
+            if not isinstance(result, Exception):
+                self.store.set(key, self.label, names, params, result)
             yield params, result
 
+    def iterate(self, samples):
+        "Evaluates the given samples"
+        if self.workers:
+            yield from self.iterate_workers(samples)
+            return
+        for params in samples:
+            yield params, self.evaluate(params)
+
+    async def aevaluate(self, params):
+        "Returns the result for the given parameters awaiting the coroutine functions"
+        tmp = self.tunable.copy()
+        for var, val in zip(self.variables, params):
+            tmp.fix(var, val)
+
+        try:
+            return self.callback(await tmp.acompute(**self.compute_kwargs))
+        except Exception as err:
+            return err
+
+    async def __aiter__(self):
+        """
+        Iterates over (params, result) of the samples without blocking the
+        event loop. The samples are computed in the loop by acompute, up to
+        self.concurrency at the same time, such that the coroutine functions
+        of the graph are awaited (results are given in the order of the samples).
+        The sweeps that are not simple evaluations of the samples (i.e. with
+        workers, store, incremental, callback_calls or another strategy)
+        are iterated in a separate thread instead, where the coroutine
+        functions are not supported.
+        """
+        if (
+            type(self).__iter__ is not Sampler.__iter__
+            or self.workers
+            or self.store is not None
+            or self.incremental
+            or self.callback_calls
+        ):
+            loop = asyncio.get_event_loop()
+            with ThreadPoolExecutor(1) as thread:
+                results = await loop.run_in_executor(thread, iter, self)
+                done = object()
+                while True:
+                    item = await loop.run_in_executor(thread, next, results, done)
+                    if item is done:
+                        return
+                    yield item
+
+        self.start()
+        pending = deque()
+        try:
+            for params in self.samples:
+                pending.append((params, asyncio.ensure_future(self.aevaluate(params))))
+                if len(pending) >= self.concurrency:
+                    params, task = pending.popleft()
+                    yield params, await task
+            while pending:
+                params, task = pending.popleft()
+                yield params, await task
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    @contextmanager
+    def open_pool(self):
+        """
+        Keeps a pool of self.workers processes open, such that all the samples
+        evaluated meanwhile by iterate_workers use the same pool.
+        The workers are initialized with a copy of the sampler made at opening.
+        """
+        if not self.workers or self._pool is not None:
+            yield self._pool
+            return
+
+        context = multiprocessing.get_context()
+        cores = None
+        if self.pin:
+            if hasattr(os, "sched_setaffinity"):
+                cores = context.Queue()
+                for core in sorted(os.sched_getaffinity(0))[: self.workers]:
+                    cores.put(core)
+            else:
+                warnings.warn("Pinning the workers is not supported on this platform")
+
+        with ProcessPoolExecutor(
+            self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(dumps(self), cores),
+        ) as pool:
+            self._pool = pool
+            try:
+                yield pool
+            finally:
+                self._pool = None
+
+    def iterate_workers(self, samples):
+        "Evaluates the samples in a pool of self.workers processes"
+        if self._pool is None:
+            with self.open_pool():
+                yield from self.iterate_workers(samples)
+            return
+
+        futures = {self._pool.submit(_evaluate, params): params for params in samples}
+        for future in futures if self.ordered else as_completed(futures):
+            yield futures[future], loads(future.result())
+
     @property
     def label(self):
         "Label used for the result"
@@ -141,16 +492,121 @@ class Sampler:
         "Headers for the values returned by the sampler"
         return tuple(self.tunable[var].label for var in self.variables) + (self.label,)
 
-    def tabulate(self, **kwargs):
-        "Returns a table of the values"
-        kwargs.setdefault("headers", self.headers)
-        return tabulate((params + (repr(result),) for params, result in self), **kwargs)
+    def rows(self):
+        "Iterates over the rows of the table and the respective result"
+        for params, result in self:
+            yield params + (repr(result),), result
+
+    def tabulate(self, columns=(), **kwargs):
+        """
+        Returns a table of the values
+
+        Parameters
+        ----------
+        columns: list of str
+            Attributes of the results shown as additional columns,
+            e.g. ("min", "stddev") for the results of robust_timer.
+        """
+        columns = tuple(columns)
+        kwargs.setdefault("headers", self.headers + columns)
+        return tabulate(
+            (
+                row + tuple(repr(getattr(result, col, None)) for col in columns)
+                for row, result in self.rows()
+            ),
+            **kwargs
+        )
 
     def _repr_html_(self):
         return self.tabulate(tablefmt="html")
 
 
-def sample(tunable, *variables, samples=100, **kwargs):
+class Quantity:
+    """
+    Mixin of the numbers printed in the most suitable of their units.
+    The units are given as a dictionary {unit: scale}.
+    """
+
+    units = {}
+
+    @property
+    def unit(self):
+        "Returns the unit used for printing the value"
+        for unit, scale in sorted(self.units.items(), key=lambda _: -_[1]):
+            if self >= scale:
+                return unit
+        return unit
+
+    def format(self, unit=None):
+        "Formats the value in the given unit (by default the most suitable one)"
+        unit = unit or self.unit
+        return f"{self / self.units[unit]:.3f} {unit}"
+
+    def __str__(self):
+        return self.format()
+
+    __repr__ = __str__
+
+
+class PrefixCache(OrderedDict):
+    """
+    LRU table of the values of the nodes indexed by the key of the node and
+    the values of the variables it depends on. The least recently used values
+    are removed when their total size exceeds max_memory (in bytes).
+    """
+
+    def __init__(self, max_memory):
+        super().__init__()
+        self.max_memory = max_memory
+        self.memory = 0
+
+    def load(self, cache, entries):
+        "Stores in cache the values found for entries {key: entry}"
+        for key, entry in entries.items():
+            if entry in self:
+                self.move_to_end(entry)
+                cache[key], cache.costs[key], _ = self[entry]
+
+    def save(self, cache, entries):
+        "Stores the values of cache for entries {key: entry}"
+        for key, entry in entries.items():
+            if key in cache and entry not in self:
+                size = sizeof(cache[key])
+                self[entry] = (cache[key], cache.costs.get(key, 1), size)
+                self.memory += size
+        while self.memory > self.max_memory and self:
+            _, (_, _, size) = self.popitem(last=False)
+            self.memory -= size
+
+
+strategies = {}
+
+_SAMPLER = None
+
+
+def _init_worker(sampler, cores):
+    "Initializes a worker process of Sampler.iterate_workers"
+    # pylint: disable=global-statement
+    global _SAMPLER
+    _SAMPLER = loads(sampler)
+    _SAMPLER.workers = None
+    if cores is not None:
+        try:
+            os.sched_setaffinity(0, {cores.get_nowait()})
+        except queue.Empty:
+            warnings.warn("More workers than available cores. Worker not pinned.")
+
+
+def _evaluate(params):
+    "Evaluates the sample in a worker returning the serialized result"
+    result = _SAMPLER.evaluate(params)
+    try:
+        return dumps(result)
+    except Exception as err:
+        return dumps(err)
+
+
+def sample(tunable, *variables, samples=100, strategy=None, **kwargs):
     """
     Samples the value of the tunable object
 
@@ -160,7 +616,18 @@ def sample(tunable, *variables, samples=100, **kwargs):
         Set of variables to sample.
     samples: int
         The number of samples to run. If None, all the combinations are sampled.
+    strategy: str
+        The strategy used for choosing the samples. By default the samples are
+        chosen randomly. Options are:
+        - bayes: model-based search, see help(BayesSampler)
+        - halving: timing by successive halving, see help(HalvingSampler)
     kwargs: dict
-        Variables passed to the compute function. See help(tunable.compute)
+        Options of the Sampler (e.g. workers) and variables passed to the
+        compute function. See help(Sampler.__init__) and help(tunable.compute)
     """
-    return Sampler(tunable, variables=variables, n_samples=samples, **kwargs)
+    if strategy is not None and strategy not in strategies:
+        raise ValueError(
+            "Unknown strategy %s. Available: %s" % (strategy, tuple(strategies))
+        )
+    cls = strategies.get(strategy, Sampler)
+    return cls(tunable, variables=variables, n_samples=samples, **kwargs)
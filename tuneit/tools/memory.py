@@ -0,0 +1,171 @@
+"Tools for measuring the memory usage"
+# pylint: disable=C0303,C0330
+
+__all__ = [
+    "memory_benchmark",
+    "memory_usage",
+    "Memory",
+]
+
+import sys
+import multiprocessing
+import tracemalloc
+from dill import dumps, loads
+from .base import Quantity, sample
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class Size(Quantity, int):
+    "Size formatter"
+    units = {"B": 1, "KiB": 2 ** 10, "MiB": 2 ** 20, "GiB": 2 ** 30, "TiB": 2 ** 40}
+
+    def format(self, unit=None):
+        unit = unit or self.unit
+        if unit == "B":
+            return f"{int(self)} B"
+        return super().format(unit)
+
+
+class Memory(Size):
+    """
+    Result of memory_usage. The value is the peak of the memory allocated
+    during the call and traced by tracemalloc.
+
+    Attributes
+    ----------
+    rss: Size
+        The peak resident set size of the process (None if not available).
+        It is the high-water mark of the whole process, thus it is
+        specific to the call only if the process is new (isolated=True).
+    """
+
+    def __new__(cls, peak, rss=None):
+        self = super().__new__(cls, peak)
+        self.rss = Size(rss) if rss is not None else None
+        return self
+
+    def __getnewargs__(self):
+        return (int(self), self.rss)
+
+    def format(self, unit=None):
+        if self.rss is None:
+            return super().format(unit)
+        return f"{super().format(unit)} (rss {self.rss.format(unit)})"
+
+
+def peak_rss():
+    "Returns the peak resident set size of the process in bytes"
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def memory_usage(fnc, isolated=False):
+    """
+    Calls fnc and returns the Memory used.
+
+    Parameters
+    ----------
+    isolated: bool
+        Whether fnc is called in a new process. Then the peak RSS is the one
+        of the call and if the process dies (e.g. killed for out of memory)
+        a MemoryError is raised.
+
+    If tracemalloc is already tracing, its peak is reset (before python 3.9
+    by restarting the tracing, which drops the traces collected so far).
+    """
+    if isolated:
+        return _isolated(fnc)
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    elif hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    else:
+        # python < 3.9: the peak is reset by restarting the tracing
+        nframe = tracemalloc.get_traceback_limit()
+        tracemalloc.stop()
+        tracemalloc.start(nframe)
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        fnc()
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        if started:
+            tracemalloc.stop()
+    return Memory(peak, peak_rss())
+
+
+def _isolated(fnc):
+    "Returns memory_usage(fnc) computed in a new process"
+    context = multiprocessing.get_context()
+    output, conn = context.Pipe(duplex=False)
+    process = context.Process(target=_run_isolated, args=(dumps(fnc), conn))
+    process.start()
+    conn.close()
+    try:
+        result = loads(output.recv())
+    except EOFError:
+        process.join()
+        raise MemoryError(
+            "The process died with exit code %s" % process.exitcode
+        ) from None
+    process.join()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def _run_isolated(fnc, conn):
+    "Target of the process started by _isolated"
+    try:
+        result = memory_usage(loads(fnc))
+    except Exception as err:
+        result = err
+    conn.send(dumps(result))
+    conn.close()
+
+
+def memory_benchmark(
+    tunable, *variables, samples=None, label="Memory", isolated=False, **kwargs
+):
+    """
+    Measures the peak memory used for computing tunable.
+    The result of each sample is a Memory with the peak of the traced
+    allocations (tracemalloc) and the peak RSS. See help(memory_usage).
+
+    Parameters
+    ----------
+    variables: list of str
+        Set of variables to sample.
+    samples: int
+        The number of samples to run. If None, all the combinations are sampled.
+    isolated: bool
+        Whether each sample is computed in a new process, such that the
+        peak RSS is the one of the sample and samples running out of memory
+        are returned as MemoryError.
+    workers: int
+        If given, the samples are measured in a pool of processes.
+    compiled: bool
+        Whether the compiled graph is measured (default True).
+        See help(HighLevel.compile).
+    kwargs: dict
+        Variables passed to the compute function. See help(tunable.compute)
+    """
+    kwargs.setdefault("compiled", True)
+    return sample(
+        tunable,
+        *variables,
+        callback=lambda fnc: memory_usage(fnc, isolated=isolated),
+        callback_calls=True,
+        samples=samples,
+        label=label,
+        **kwargs,
+    )
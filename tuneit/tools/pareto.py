@@ -0,0 +1,255 @@
+"Multi-objective tuning"
+# pylint: disable=C0303,C0330
+
+__all__ = [
+    "pareto",
+    "ParetoSampler",
+    "pareto_front",
+]
+
+from math import inf, isnan
+import numpy
+from numpy import allclose
+from .base import Sampler, sample, strategies
+from .time import default_timer, as_time
+from .memory import memory_usage
+from ..finalize import finalize
+
+
+def pareto_front(points, chunk=1024):
+    """
+    Returns a boolean mask of the non-dominated points, i.e. the points
+    for which no other point is lower or equal in all the objectives
+    and lower in at least one (all the objectives are minimized).
+
+    Parameters
+    ----------
+    points: array
+        The objectives of the points, one row per point.
+    chunk: int
+        Number of points compared at once (memory is chunk * len(points)).
+    """
+    points = numpy.asarray(points, dtype=float)
+    if points.ndim != 2:
+        raise ValueError("Expected a 2D array of points")
+    dominated = numpy.zeros(len(points), dtype=bool)
+    for start in range(0, len(points), chunk):
+        other = points[start : start + chunk, None, :]
+        lower_equal = (other <= points[None]).all(axis=-1)
+        lower = (other < points[None]).any(axis=-1)
+        dominated |= (lower_equal & lower).any(axis=0)
+    return ~dominated
+
+
+class ParetoSampler(Sampler):
+    """
+    Sampler that measures several metrics in one evaluation of each sample
+    and finds the samples on the Pareto front.
+
+    The result of each sample is a dictionary {metric: value}. If a metric
+    fails, its value is the exception and the sample is considered the worst
+    for that metric.
+
+    Parameters
+    ----------
+    metrics: list or dict
+        The metrics to measure. Either names of the predefined metrics:
+        - time: the time of the computation (minimized), see timer.
+        - memory: the peak memory of the computation (minimized).
+          See help(memory_usage).
+        - xcheck: the comparison with the reference (maximized).
+          See help(crosscheck).
+        or a dictionary {name: (fnc, minimize)} where fnc is called with
+        the function computing the sample and returns the value of the metric.
+    reference: Any
+        The reference value for xcheck. If None, the result with
+        the default values is used.
+    comparison: callable (default = numpy.allclose)
+        The function used by xcheck, called as fnc(reference, value).
+    timer: callable
+        The timer used by time, called as timer(fnc, **timer_kwargs).
+    timer_kwargs: dict
+        Arguments passed to the timer.
+    """
+
+    def __init__(
+        self,
+        tunable,
+        metrics=("time", "memory"),
+        reference=None,
+        comparison=allclose,
+        timer=default_timer,
+        timer_kwargs=None,
+        **kwargs,
+    ):
+        if kwargs.pop("callback", None) is not None:
+            raise TypeError(
+                "ParetoSampler does not accept a callback: use metrics instead"
+            )
+        kwargs["callback_calls"] = True
+        super().__init__(tunable, **kwargs)
+        if reference is None and "xcheck" in metrics:
+            reference = finalize(tunable).copy().compute()
+        timer_kwargs = dict(timer_kwargs or {})
+        predefined = {
+            "time": (lambda fnc: as_time(timer(fnc, **timer_kwargs)), True),
+            "memory": (memory_usage, True),
+            "xcheck": (lambda fnc: comparison(reference, fnc()), False),
+        }
+        if not isinstance(metrics, dict):
+            unknown = set(metrics).difference(predefined)
+            if unknown:
+                raise ValueError(
+                    "Unknown metrics %s. Available: %s" % (unknown, tuple(predefined))
+                )
+            metrics = {name: predefined[name] for name in metrics}
+        if not metrics:
+            raise ValueError("No metrics given")
+        self.metrics = metrics
+        self.evaluated = {}
+
+    @property
+    def callback(self):
+        def measure(fnc):
+            result = {}
+            for name, (metric, _) in self.metrics.items():
+                try:
+                    result[name] = metric(fnc)
+                except Exception as err:
+                    result[name] = err
+            return result
+
+        return measure
+
+    def __iter__(self):
+        self.evaluated.clear()
+        for params, result in super().__iter__():
+            self.evaluated[params] = result
+            yield params, result
+
+    def objectives(self, results):
+        "Returns the array of the objectives of the results (to be minimized)"
+        points = numpy.full((len(results), len(self.metrics)), inf)
+        for row, result in enumerate(results):
+            if not isinstance(result, dict):
+                continue
+            for col, (name, (_, minimize)) in enumerate(self.metrics.items()):
+                try:
+                    value = float(result[name])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if not isnan(value):
+                    points[row, col] = value if minimize else -value
+        return points
+
+    def front(self):
+        """
+        Returns the list of (params, result) on the Pareto front.
+        The samples are evaluated if this has not been done yet.
+        """
+        if not self.evaluated:
+            dict(self)
+        params = list(self.evaluated)
+        results = [self.evaluated[par] for par in params]
+        mask = pareto_front(self.objectives(results))
+        return [(params[idx], results[idx]) for idx in numpy.flatnonzero(mask)]
+
+    def select(self, weights=None, **constraints):
+        """
+        Returns the params of a sample on the Pareto front.
+
+        Parameters
+        ----------
+        weights: dict
+            The weights of the metrics {metric: weight}. The sample that
+            minimizes the weighted sum of the objectives, normalized to the
+            range of the front, is selected. By default all the weights are 1.
+        constraints: dict
+            Bounds of the metrics, e.g. memory=2**30. The value of a metric is
+            required to be lower (if minimized) or higher (if maximized)
+            or equal to the bound.
+        """
+        front = self.front()
+        names = list(self.metrics)
+        unknown = set(constraints).union(weights or ()).difference(names)
+        if unknown:
+            raise ValueError("Unknown metrics %s" % unknown)
+        points = self.objectives([result for _, result in front])
+
+        bounds = numpy.full(len(names), inf)
+        for name, value in constraints.items():
+            col = names.index(name)
+            bounds[col] = value if self.metrics[name][1] else -value
+        valid = (points <= bounds).all(axis=1) & numpy.isfinite(points).all(axis=1)
+        if not valid.any():
+            raise ValueError("No sample satisfies the constraints")
+
+        points = points[valid]
+        low, high = points.min(axis=0), points.max(axis=0)
+        scaled = (points - low) / numpy.where(high > low, high - low, 1)
+        weights = numpy.array([(weights or {}).get(name, 1) for name in names])
+        best = numpy.argmin(scaled @ weights)
+        return [params for (params, _), ok in zip(front, valid) if ok][best]
+
+    def fix(self, weights=None, **constraints):
+        """
+        Returns a copy of the tunable with the variables fixed to the
+        values of the sample selected from the Pareto front.
+        See help(select) for the parameters.
+        """
+        params = self.select(weights, **constraints)
+        tunable = self.tunable.copy()
+        for var, val in zip(self.variables, params):
+            tunable.fix(var, val)
+        return tunable
+
+    @property
+    def headers(self):
+        return (
+            tuple(self.tunable[var].label for var in self.variables)
+            + tuple(self.metrics)
+            + ("pareto",)
+        )
+
+    def rows(self):
+        "Iterates over the rows of the table, one column per metric"
+        results = list(self)
+        front = set(params for params, _ in self.front())
+        for params, result in results:
+            values = tuple(
+                repr(result.get(name)) if isinstance(result, dict) else repr(result)
+                for name in self.metrics
+            )
+            yield params + values + ("*" if params in front else "",), result
+
+
+strategies["pareto"] = ParetoSampler
+
+
+def pareto(tunable, *variables, metrics=("time", "memory"), samples=None, **kwargs):
+    """
+    Measures several metrics of tunable and finds the Pareto front.
+    Returns a ParetoSampler, see help(ParetoSampler) for the metrics
+    and for selecting a sample from the front (select, fix).
+
+    Parameters
+    ----------
+    variables: list of str
+        Set of variables to sample.
+    metrics: list or dict
+        The metrics to measure, e.g. ("time", "memory", "xcheck").
+    samples: int
+        The number of samples to run. If None, all the combinations are sampled.
+    kwargs: dict
+        Options of the ParetoSampler and variables passed to the compute function.
+        See help(ParetoSampler) and help(tunable.compute)
+    """
+    kwargs.setdefault("compiled", True)
+    return sample(
+        tunable,
+        *variables,
+        metrics=metrics,
+        samples=samples,
+        strategy="pareto",
+        **kwargs,
+    )
@@ -0,0 +1,240 @@
+"""
+Model-based search strategies for the samplers
+"""
+# pylint: disable=C0303,C0330
+
+__all__ = [
+    "BayesSampler",
+]
+
+from math import ceil, inf, isnan
+from random import Random
+import numpy
+from .base import Sampler, strategies
+from ..space import Grid, Permutations, size_of
+
+
+class Dimension:
+    """
+    Kernel of a variable used by the density estimators of BayesSampler.
+    Values are represented by their index in the variable range.
+    """
+
+    def __init__(self, values):
+        self.values = values
+        self.size = size_of(values)
+
+    @classmethod
+    def new(cls, values):
+        "Returns the dimension suitable for the values"
+        if isinstance(values, Permutations):
+            return PermutationDimension(values)
+        if isinstance(values, (range, Grid)) or all(
+            isinstance(val, (int, float)) and not isinstance(val, bool)
+            for val in values
+        ):
+            return OrdinalDimension(values)
+        return Dimension(values)
+
+    def kernel(self, idx, centers, width):
+        "Similarity between idx and the centers (1 if equal)"
+        # pylint: disable=W0613
+        return (numpy.asarray(centers) == idx).astype(float)
+
+    def perturb(self, idx, width, rng):
+        "Returns an index close to idx"
+        # pylint: disable=W0613
+        if rng.random() < 0.5:
+            return idx
+        return rng.randrange(self.size)
+
+
+class OrdinalDimension(Dimension):
+    "Dimension of ordered values (ranges, grids, numbers)"
+
+    def kernel(self, idx, centers, width):
+        bandwidth = max(1.0, width * self.size)
+        return numpy.exp(-0.5 * ((numpy.asarray(centers) - idx) / bandwidth) ** 2)
+
+    def perturb(self, idx, width, rng):
+        bandwidth = max(1.0, width * self.size)
+        return min(max(round(rng.gauss(idx, bandwidth)), 0), self.size - 1)
+
+
+class PermutationDimension(Dimension):
+    "Dimension of permutations. The distance is the number of different positions"
+
+    def __init__(self, values):
+        super().__init__(values)
+        self.cache = {}
+
+    def permutation(self, idx):
+        "Returns the permutation at idx as positions of the original values"
+        if idx not in self.cache:
+            self.cache[idx] = self.values.positions(idx)
+        return self.cache[idx]
+
+    def kernel(self, idx, centers, width):
+        perm = self.permutation(idx)
+        centers = numpy.array([self.permutation(cen) for cen in centers])
+        dist = (centers != perm).sum(axis=1)
+        return numpy.exp(-dist / max(1.0, width * len(perm)))
+
+    def perturb(self, idx, width, rng):
+        perm = list(self.values[idx])
+        if len(perm) < 2:
+            return idx
+        while True:
+            i, j = rng.sample(range(len(perm)), 2)
+            perm[i], perm[j] = perm[j], perm[i]
+            if rng.random() >= width:
+                return self.values.index(perm)
+
+
+class BayesSampler(Sampler):
+    """
+    Sampler that chooses the next point from the results of the previous ones
+    with a Tree-structured Parzen Estimator (TPE).
+
+    The evaluated points are split in good (the best fraction gamma) and bad.
+    For each variable, a kernel density is estimated for both groups and
+    the candidate that maximizes the ratio good/bad is evaluated next.
+
+    Parameters
+    ----------
+    n_samples: int
+        The budget, i.e. the number of points to evaluate.
+    startup: int
+        Number of random points evaluated before using the model.
+    gamma: float
+        Fraction of the points considered as good.
+    candidates: int
+        Number of candidates proposed for each point.
+    minimize: bool
+        Whether the result should be minimized or maximized.
+    seed: int
+        Seed of the random generator.
+
+    With workers, the points are proposed in batches of one point per worker
+    and all the batches are evaluated in the same pool of processes.
+    """
+
+    def __init__(
+        self,
+        tunable,
+        startup=10,
+        gamma=0.25,
+        candidates=24,
+        minimize=True,
+        seed=None,
+        **kwargs,
+    ):
+        super().__init__(tunable, **kwargs)
+        self.startup = startup
+        self.gamma = gamma
+        self.candidates = candidates
+        self.minimize = minimize
+        self.seed = seed
+        self.history = []
+
+    @property
+    def dimensions(self):
+        "The dimensions of the variables"
+        return tuple(Dimension.new(self.tunable[var].values) for var in self.variables)
+
+    def score(self, result):
+        "Returns the score to be minimized"
+        try:
+            score = float(result)
+        except (TypeError, ValueError):
+            return inf
+        if isnan(score):
+            return inf
+        return score if self.minimize else -score
+
+    def from_index(self, idxs):
+        "Returns the params of the indices"
+        return tuple(
+            self.tunable[var].get_value(idx) for var, idx in zip(self.variables, idxs)
+        )
+
+    def propose(self, dims, points, rng, pending=()):
+        """
+        Returns the indices of the next point to evaluate
+        (different from the pending points, that are being evaluated)
+        """
+        evaluated = set(idxs for idxs, _ in points).union(pending)
+
+        if len(points) < self.startup:
+            for _ in range(100):
+                idxs = tuple(rng.randrange(dim.size) for dim in dims)
+                if idxs not in evaluated:
+                    return idxs
+
+        ranked = sorted(points, key=lambda _: _[1])
+        n_good = max(1, ceil(self.gamma * len(ranked)))
+        good = [idxs for idxs, _ in ranked[:n_good]]
+        bad = [idxs for idxs, _ in ranked[n_good:]] or good
+        width = 1 / (1 + n_good)
+
+        best, best_value = None, -inf
+        for _ in range(self.candidates):
+            center = rng.choice(good)
+            idxs = tuple(
+                dim.perturb(idx, width, rng) for dim, idx in zip(dims, center)
+            )
+            if idxs in evaluated:
+                continue
+            value = 0.0
+            for num, (dim, idx) in enumerate(zip(dims, idxs)):
+                prior = 1 / dim.size
+                good_den = dim.kernel(idx, [_[num] for _ in good], width).sum()
+                bad_den = dim.kernel(idx, [_[num] for _ in bad], width).sum()
+                value += numpy.log((good_den + prior) / (len(good) + 1))
+                value -= numpy.log((bad_den + prior) / (len(bad) + 1))
+            if value > best_value:
+                best, best_value = idxs, value
+
+        if best is None:
+            # All the candidates have been evaluated: random search
+            for _ in range(100):
+                idxs = tuple(rng.randrange(dim.size) for dim in dims)
+                if idxs not in evaluated:
+                    return idxs
+        return best
+
+    def __iter__(self):
+        self.start()
+        rng = Random(self.seed)
+        dims = self.dimensions
+        points = []
+        self.history.clear()
+        best = None
+        with self.open_pool():
+            while len(points) < self.n_samples:
+                batch = {}
+                for _ in range(min(self.workers or 1, self.n_samples - len(points))):
+                    idxs = self.propose(dims, points, rng, batch.values())
+                    if idxs is None:
+                        break
+                    batch[self.from_index(idxs)] = idxs
+                if not batch:
+                    break
+                for params, result in self.results(list(batch)):
+                    points.append((batch[params], self.score(result)))
+                    if best is None or points[-1][1] < best[1]:
+                        best = (params, points[-1][1], result)
+                    self.history.append((best[0], best[2]))
+                    yield params, result
+
+    @property
+    def headers(self):
+        return super().headers + ("best " + self.label,)
+
+    def rows(self):
+        "Iterates over the rows of the table, including the best result so far"
+        for (params, result), (_, best) in zip(self, self.history):
+            yield params + (repr(result), repr(best)), result
+
+
+strategies["bayes"] = BayesSampler
@@ -0,0 +1,206 @@
+"""
+Persistent storage of the sampled results
+"""
+# pylint: disable=C0303,C0330
+
+__all__ = [
+    "TuningStore",
+    "graph_key",
+]
+
+import os
+import sqlite3
+from contextlib import contextmanager
+from hashlib import md5
+from dill import dumps, loads
+from ..graph import Key, parts
+from ..tunable import Object
+from ..variable import Variable
+from ..finalize import finalize
+from ..executor import Schedule
+
+
+def stable_keys(tunable):
+    """
+    Returns a key for each node of the graph that does not change between runs.
+
+    The keys are computed from the content of the nodes and the keys of their
+    dependencies. Variables are identified by their label, their range and
+    their value if fixed, instead of their (random) uid.
+    """
+    tunable = finalize(tunable)
+    backend = tunable.graph.backend
+    keys = {}
+    for key in Schedule(tunable.graph, tunable.key):
+        value = backend[key]
+        if isinstance(value, Variable):
+            content = (value.label, value.var, value.value if value.fixed else None)
+        else:
+            content = tuple(
+                keys.get(Key(part).key, part) if isinstance(part, Key) else part
+                for part in parts(value)
+            )
+            if isinstance(value, Object):
+                content = (value.label,) + content
+        try:
+            keys[key] = md5(dumps((type(value).__name__, content))).hexdigest()
+        except Exception as _:
+            keys[key] = key
+    return keys
+
+
+def graph_key(tunable):
+    "Returns the key of the finalized tunable that does not change between runs"
+    tunable = finalize(tunable)
+    return stable_keys(tunable)[Key(tunable.key).key]
+
+
+class TuningStore:
+    """
+    SQLite storage of the results of the samplers.
+
+    The results are indexed by the graph key of the tunable (see graph_key),
+    the label of the sampler (e.g. "Time") and the sampled values.
+    It is safe to use the same file from several processes.
+
+    Parameters
+    ----------
+    path: str
+        Path of the database. By default $TUNEIT_STORE or ~/.cache/tuneit/store.db
+    name: str
+        If given, the results of previous graphs stored with the same name
+        are removed when a different graph is used.
+    timeout: float
+        Seconds to wait for the lock of the database.
+    """
+
+    def __init__(self, path=None, name=None, timeout=60):
+        if path is None:
+            path = os.environ.get(
+                "TUNEIT_STORE", os.path.join("~", ".cache", "tuneit", "store.db")
+            )
+        self.path = os.path.expanduser(path)
+        self.name = name
+        self.timeout = timeout
+        self._keys = set()
+
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        with self.connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS results (
+                key TEXT, label TEXT, variables TEXT, params TEXT,
+                point BLOB, result BLOB,
+                PRIMARY KEY (key, label, variables, params))"""
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS graphs (name TEXT PRIMARY KEY, key TEXT)"
+            )
+
+    @contextmanager
+    def connect(self):
+        "Opens a connection to the database and commits at exit"
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def check_key(self, key):
+        "Removes the results of the previous graph with the same name if key changed"
+        if self.name is None or key in self._keys:
+            return
+        with self.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            old = conn.execute(
+                "SELECT key FROM graphs WHERE name=?", (self.name,)
+            ).fetchone()
+            if old and old[0] != key:
+                conn.execute("DELETE FROM results WHERE key=?", old)
+            conn.execute("REPLACE INTO graphs VALUES (?, ?)", (self.name, key))
+        self._keys.add(key)
+
+    def get(self, key, label, variables, params):
+        "Returns (True, result) if found or (False, None) otherwise"
+        self.check_key(key)
+        with self.connect() as conn:
+            row = conn.execute(
+                """SELECT result FROM results
+                WHERE key=? AND label=? AND variables=? AND params=?""",
+                (key, label, repr(tuple(variables)), repr(tuple(params))),
+            ).fetchone()
+        if row is None:
+            return False, None
+        return True, loads(row[0])
+
+    def set(self, key, label, variables, params, result):
+        "Stores the result"
+        self.check_key(key)
+        with self.connect() as conn:
+            conn.execute(
+                "REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    label,
+                    repr(tuple(variables)),
+                    repr(tuple(params)),
+                    dumps((tuple(variables), tuple(params))),
+                    dumps(result),
+                ),
+            )
+
+    def results(self, key, label):
+        "Iterates over the stored (variables, params, result) of the graph"
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT point, result FROM results WHERE key=? AND label=?",
+                (key, label),
+            ).fetchall()
+        for point, result in rows:
+            yield loads(point) + (loads(result),)
+
+    def best(self, tunable, label="Time", objective=min):
+        """
+        Returns the best known parameters of tunable as a dict {variable: value}.
+        The best result is chosen with objective (e.g. min or max).
+        """
+        tunable = finalize(tunable)
+        keys = stable_keys(tunable)
+        variables = {keys[var]: var for var in tunable.variables}
+        candidates = [
+            (result, dict(zip(names, params)))
+            for names, params, result in self.results(
+                keys[Key(tunable.key).key], label
+            )
+            if not isinstance(result, Exception) and set(names) <= set(variables)
+        ]
+        if not candidates:
+            return {}
+        params = objective(candidates, key=lambda _: _[0])[1]
+        return {variables[name]: value for name, value in params.items()}
+
+    def fix(self, tunable, label="Time", objective=min):
+        """
+        Fixes the tunable variables of tunable (finalized) to the best known values.
+        Returns the fixed values.
+        """
+        tunable = finalize(tunable)
+        params = self.best(tunable, label=label, objective=objective)
+        for var, value in params.items():
+            if not tunable[var].fixed:
+                tunable.fix(var, value)
+        return params
+
+    def clear(self):
+        "Removes all the stored results"
+        with self.connect() as conn:
+            conn.execute("DELETE FROM results")
+            conn.execute("DELETE FROM graphs")
+        self._keys.clear()
+
+    def __repr__(self):
+        return "TuningStore(%r)" % self.path
@@ -3,30 +3,248 @@
 
 __all__ = [
     "benchmark",
+    "HalvingSampler",
+    "robust_timer",
+    "Timing",
 ]
 
-from timeit import timeit
-from .base import sample
+from math import ceil, erf, inf, sqrt
+from statistics import mean, median, stdev
+from timeit import Timer, timeit
+from .base import Sampler, Quantity, sample, strategies
 
 
-class Time(float):
+class Time(Quantity, float):
     "Time formatter"
     units = {"nsec": 1e-9, "usec": 1e-6, "msec": 1e-3, "sec": 1.0}
 
-    def __str__(self):
-        scales = [(scale, unit) for unit, scale in Time.units.items()]
-        scales.sort(reverse=True)
-        for scale, unit in scales:
-            if self >= scale:
-                break
 
-        return f"{self / scale:.3f} {unit}"
+class Timing(Time):
+    """
+    Result of robust_timer. The value is the median of the timed samples.
+
+    Attributes
+    ----------
+    samples: tuple of float
+        The time per call of each repeat.
+    number: int
+        Number of calls per repeat.
+    outliers: int
+        Number of samples out of 1.5 times the inter-quartile range.
+        They are excluded from mean, stddev and ci.
+    """
+
+    def __new__(cls, samples, number=1, confidence=0.95):
+        samples = tuple(samples)
+        self = super().__new__(cls, median(samples))
+        self.samples = samples
+        self.number = number
+        self.confidence = confidence
+        return self
+
+    def __getnewargs__(self):
+        return (self.samples, self.number, self.confidence)
+
+    @property
+    def inliers(self):
+        "The samples that are not outliers"
+        if len(self.samples) < 4:
+            return self.samples
+        low, _, high = quartiles(self.samples)
+        low, high = low - 1.5 * (high - low), high + 1.5 * (high - low)
+        return tuple(val for val in self.samples if low <= val <= high)
+
+    @property
+    def outliers(self):
+        "Number of outliers"
+        return len(self.samples) - len(self.inliers)
+
+    @property
+    def min(self):
+        "Minimum time"
+        return Time(min(self.samples))
+
+    @property
+    def median(self):
+        "Median time"
+        return Time(self)
+
+    @property
+    def mean(self):
+        "Mean time of the inliers"
+        return Time(mean(self.inliers))
+
+    @property
+    def stddev(self):
+        "Standard deviation of the inliers"
+        inliers = self.inliers
+        return Time(stdev(inliers) if len(inliers) > 1 else 0)
 
-    __repr__ = __str__
+    @property
+    def ci(self):
+        "Confidence interval of the mean (normal approximation)"
+        z = normal_quantile((1 + self.confidence) / 2)
+        delta = z * self.stddev / sqrt(len(self.inliers))
+        return Time(self.mean - delta), Time(self.mean + delta)
+
+    def format(self, unit=None):
+        unit = unit or self.unit
+        return f"{super().format(unit)} ± {self.stddev.format(unit)}"
+
+
+def quartiles(data):
+    "Returns the quartiles of the data (as statistics.quantiles(data, n=4))"
+    data = sorted(data)
+    size = len(data)
+    result = []
+    for i in range(1, 4):
+        j = min(max(i * (size + 1) // 4, 1), size - 1)
+        delta = i * (size + 1) - j * 4
+        result.append((data[j - 1] * (4 - delta) + data[j] * delta) / 4)
+    return result
+
+
+def normal_quantile(prob, tol=1e-12):
+    "Returns x such that P(X < x) = prob for the standard normal distribution"
+    low, high = -40.0, 40.0
+    while high - low > tol:
+        mid = (low + high) / 2
+        if (1 + erf(mid / sqrt(2))) / 2 < prob:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+def as_time(value):
+    "Casts the value returned by a timer to Time"
+    return value if isinstance(value, Time) else Time(value)
 
 
 def default_timer(fnc, number=100):
-    return timeit(fnc, number=100) / number
+    "Returns the average time of number calls of fnc"
+    return timeit(fnc, number=number) / number
+
+
+def robust_timer(fnc, number=None, repeat=7, warmup=1, target=0.2, confidence=0.95):
+    """
+    Times fnc returning a Timing with the statistics of the samples.
+
+    Parameters
+    ----------
+    number: int
+        Number of calls per repeat. If None, it is calibrated such that
+        all the repeats take about target seconds.
+    repeat: int
+        Number of timed samples.
+    warmup: int
+        Number of calls done before timing.
+    target: float
+        Target duration in seconds for the calibration of number.
+    confidence: float
+        Confidence level of the interval Timing.ci.
+    """
+    for _ in range(warmup):
+        fnc()
+    timer = Timer(fnc)
+    if number is None:
+        number, elapsed = 1, timer.timeit(1)
+        while elapsed * repeat < target:
+            if elapsed > 0:
+                number = max(number + 1, int(number * target / (elapsed * repeat)))
+            else:
+                number *= 10
+            elapsed = timer.timeit(number)
+    samples = (time / number for time in timer.repeat(repeat=repeat, number=number))
+    return Timing(samples, number=number, confidence=confidence)
+
+
+class HalvingSampler(Sampler):
+    """
+    Sampler that times the samples by successive halving.
+
+    All the samples are first timed with min_number repetitions. At each round
+    only the fastest 1/eta of the samples are kept and timed again with eta times
+    more repetitions, until one sample is left or the number of repetitions
+    of the timer is reached. The slow samples are discarded after few runs and
+    the result returned for them is the time of their last round.
+    The results are yielded as soon as they are final: the discarded samples
+    at the end of each round (fastest first), the others while timed
+    in the last round.
+
+    Parameters
+    ----------
+    timer: callable
+        The timer, called as timer(fnc, number=number, **timer_kwargs).
+    timer_kwargs: dict
+        Arguments passed to the timer. The number of repetitions of the
+        last round is timer_kwargs["number"] (default 100).
+    eta: int
+        Reduction factor of the samples and increase of the repetitions per round.
+    min_number: int
+        Number of repetitions of the first round.
+    """
+
+    def __init__(
+        self,
+        tunable,
+        timer=default_timer,
+        timer_kwargs=None,
+        eta=3,
+        min_number=1,
+        **kwargs,
+    ):
+        if eta < 2:
+            raise ValueError("eta must be larger than one")
+        if kwargs.pop("callback", None) is not None:
+            raise TypeError(
+                "HalvingSampler does not accept a callback: it times the samples"
+            )
+        kwargs["callback_calls"] = True
+        super().__init__(tunable, **kwargs)
+        self.timer = timer
+        self.timer_kwargs = dict(timer_kwargs or {})
+        self.max_number = self.timer_kwargs.pop("number", 100)
+        self.eta = eta
+        self.min_number = max(1, min(min_number, self.max_number))
+        self.number = self.min_number
+        self.rounds = []
+
+    @property
+    def callback(self):
+        return lambda fnc: as_time(
+            self.timer(fnc, number=self.number, **self.timer_kwargs)
+        )
+
+    @staticmethod
+    def score(result):
+        "Returns the time of the result or inf for failures"
+        return inf if isinstance(result, Exception) else float(result)
+
+    def __iter__(self):
+        self.start()
+        alive = list(self.samples)
+        self.number = self.min_number
+        self.rounds.clear()
+
+        while True:
+            last = len(alive) <= 1 or self.number * self.eta > self.max_number
+            if last:
+                self.number = self.max_number
+            self.rounds.append((self.number, len(alive)))
+            if last:
+                yield from self.results(alive)
+                return
+            times = dict(self.iterate(alive))
+            alive.sort(key=lambda params: self.score(times[params]))
+            keep = ceil(len(alive) / self.eta)
+            for params in alive[keep:]:
+                yield params, times[params]
+            alive = alive[:keep]
+            self.number *= self.eta
+
+
+strategies["halving"] = HalvingSampler
 
 
 def benchmark(
@@ -36,6 +254,8 @@ def benchmark(
     timer_kwargs=None,
     samples=None,
     label="Time",
+    strategy=None,
+    budget=None,
     **kwargs,
 ):
     """
@@ -52,19 +272,43 @@ def benchmark(
         Set of variables to sample.
     samples: int
         The number of samples to run. If None, all the combinations are sampled.
+    strategy: str
+        The strategy used for choosing the samples, e.g. "bayes" for a
+        model-based search. See help(sample). With "halving" all the samples
+        are timed by successive halving, see help(HalvingSampler).
+    budget: int
+        Alias of samples. The maximum number of points to time.
+    timer: callable
+        The timer, called as timer(fnc, **timer_kwargs). Use robust_timer
+        for warmup, calibration and statistics of the timings.
     timer_kwargs: dict
         Arguments passed to the timer. For default timer:
         - number: (int) number of iterations
+    workers: int
+        If given, the samples are timed in a pool of processes. By default
+        each worker is pinned to a different core (pin=True).
+    compiled: bool
+        Whether the compiled graph is timed (default True), such that the
+        overhead of compute is not measured. See help(HighLevel.compile).
     kwargs: dict
         Variables passed to the compute function. See help(tunable.compute)
     """
+    kwargs.setdefault("pin", True)
+    kwargs.setdefault("compiled", True)
+
+    if strategy == "halving":
+        kwargs.update(timer=timer, timer_kwargs=timer_kwargs)
+    else:
+        kwargs.update(
+            callback=lambda fnc: as_time(timer(fnc, **(timer_kwargs or {}))),
+            callback_calls=True,
+        )
 
     return sample(
         tunable,
         *variables,
-        callback=lambda fnc: Time(timer(fnc, **(timer_kwargs or {}))),
-        callback_calls=True,
-        samples=samples,
+        samples=budget or samples,
         label=label,
+        strategy=strategy,
         **kwargs,
     )
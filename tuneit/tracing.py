@@ -0,0 +1,164 @@
+"""
+Tracing of the evaluation of the nodes of the graphs.
+"""
+# pylint: disable=C0303,C0330
+
+__all__ = [
+    "Tracer",
+]
+
+import os
+import json
+from threading import Lock, local, get_ident
+from time import perf_counter
+from tabulate import tabulate
+
+try:
+    from time import thread_time
+except ImportError:  # python < 3.7
+    from time import process_time as thread_time
+
+current = None
+"The active Tracer. The compute path only checks that it is not None."
+
+
+class NodeStats:
+    "Statistics of the evaluations of a node"
+
+    __slots__ = ["calls", "wall", "self", "cpu", "threads"]
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.self = 0.0
+        self.cpu = 0.0
+        self.threads = set()
+
+
+class Tracer:
+    """
+    Records the evaluation of the nodes done by compute and by the executors
+    while active. It can be used as a context manager:
+
+    >>> with Tracer() as tracer:
+    ...     tunable.compute()
+    >>> print(tracer.tabulate())
+
+    For each node key it records the number of evaluations, the wall time
+    (total and excluding the dependencies evaluated meanwhile), the CPU time
+    of the thread (of the process before python 3.7) and the threads involved. Every evaluation is also kept as
+    an event that can be exported as a Chrome trace (see chrome_trace).
+    Evaluations done in other processes (e.g. sampler workers) are not seen.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self.events = []
+        self._lock = Lock()
+        self._local = local()
+        self._previous = None
+        self.start = perf_counter()
+
+    def __enter__(self):
+        global current
+        self._previous, current = current, self
+        return self
+
+    def __exit__(self, *args):
+        global current
+        current, self._previous = self._previous, None
+
+    @property
+    def _stack(self):
+        "Time of the dependencies of the running evaluations (per thread)"
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def record(self, key, fnc, *args, **kwargs):
+        "Returns fnc(*args, **kwargs) recording the evaluation of the node key"
+        stack = self._stack
+        stack.append(0.0)
+        start, cpu = perf_counter(), thread_time()
+        try:
+            return fnc(*args, **kwargs)
+        finally:
+            wall, cpu = perf_counter() - start, thread_time() - cpu
+            children = stack.pop()
+            if stack:
+                stack[-1] += wall
+            thread = get_ident()
+            with self._lock:
+                stats = self.stats.get(key)
+                if stats is None:
+                    stats = self.stats[key] = NodeStats()
+                stats.calls += 1
+                stats.wall += wall
+                stats.self += wall - children
+                stats.cpu += cpu
+                stats.threads.add(thread)
+                self.events.append((key, start, wall, cpu, thread))
+
+    def hot(self, sort="self"):
+        "Returns the keys of the nodes sorted by decreasing sort (an attribute of the stats)"
+        return sorted(self.stats, key=lambda key: -getattr(self.stats[key], sort))
+
+    def tabulate(self, sort="self", limit=None, **kwargs):
+        """
+        Returns a table of the nodes sorted by decreasing sort
+        (one of calls, wall, self, cpu). limit is the maximum number of rows.
+        """
+        # pylint: disable=import-outside-toplevel
+        from .tools.time import Time
+
+        rows = []
+        for key in self.hot(sort)[:limit]:
+            stats = self.stats[key]
+            rows.append(
+                (
+                    key,
+                    stats.calls,
+                    Time(stats.wall).format(),
+                    Time(stats.self).format(),
+                    Time(stats.cpu).format(),
+                    len(stats.threads),
+                )
+            )
+        headers = ("node", "calls", "wall", "self", "cpu", "threads")
+        return tabulate(rows, headers=headers, **kwargs)
+
+    def chrome_trace(self, filename=None):
+        """
+        Returns the events in the Chrome trace format, that can be opened
+        with chrome://tracing or https://ui.perfetto.dev.
+        If filename is given, the trace is written there as JSON.
+        """
+        pid = os.getpid()
+        trace = dict(
+            traceEvents=[
+                dict(
+                    name=key.split("-")[0],
+                    cat="node",
+                    ph="X",
+                    ts=(start - self.start) * 1e6,
+                    dur=wall * 1e6,
+                    pid=pid,
+                    tid=thread,
+                    args=dict(key=key, cpu=cpu * 1e6),
+                )
+                for key, start, wall, cpu, thread in self.events
+            ],
+            displayTimeUnit="ms",
+        )
+        if filename is not None:
+            with open(filename, "w") as out:
+                json.dump(trace, out)
+        return trace
+
+    def _repr_html_(self):
+        return self.tabulate(tablefmt="html")
+
+    def __repr__(self):
+        return "Tracer(nodes=%d, events=%d)" % (len(self.stats), len(self.events))
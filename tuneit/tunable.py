@@ -3,25 +3,28 @@
 
 __all__ = [
     "compute",
+    "Cache",
     "Tunable",
     "tunable",
     "Object",
     "function",
     "Function",
+    "impure",
 ]
 
 import operator
 import warnings
 from inspect import ismethod
+from threading import local
 from collections import deque
 from collections.abc import Iterable
-from hashlib import md5
-from dill import dumps
 from uuid import uuid4
 from dataclasses import dataclass
 from typing import Any
 from varname import varname as _varname, VarnameRetrievingError
 from .graph import Graph, Node, Key
+from .hashing import tokenize
+from . import tracing
 
 
 def varname(caller=1, default=None):
@@ -32,13 +35,173 @@ def varname(caller=1, default=None):
         return default
 
 
+class Cache(dict):
+    """
+    Table of the computed values indexed by the key of the nodes.
+    It is used by compute to evaluate each node only once per run.
+
+    Counters
+    --------
+    hits: int
+        Number of times a value has been taken from the table.
+    misses: int
+        Number of nodes that have been evaluated.
+    saved: int
+        Number of node evaluations that have been saved, i.e. the evaluations
+        that a compute without cache would have done in addition.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0
+        self.costs = {}
+        self._local = local()
+
+    def reset(self, values=True):
+        "Clears the counters and, if values, the table"
+        if values:
+            self.clear()
+            self.costs.clear()
+        self.hits = self.misses = self.saved = 0
+
+    def discard(self, keys):
+        "Removes the values of the given keys from the table"
+        for key in keys:
+            self.pop(key, None)
+            self.costs.pop(key, None)
+
+    def copy(self):
+        "Returns a new Cache with the same values and zero counters"
+        cache = Cache(self)
+        cache.costs.update(self.costs)
+        return cache
+
+    def merge(self, other):
+        "Adds the values and the counters of other"
+        self.update(other)
+        self.costs.update(other.costs)
+        self.hits += other.hits
+        self.misses += other.misses
+        self.saved += other.saved
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = local()
+
+    @property
+    def _stack(self):
+        "Stack of the evaluations done by the running computations (per thread)"
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def _count(self, cost):
+        if self._stack:
+            self._stack[-1] += cost
+
+    def get_value(self, key):
+        "Returns the value stored for key counting the hit"
+        cost = self.costs.get(key, 1)
+        self.hits += 1
+        self.saved += cost
+        self._count(cost)
+        return self[key]
+
+    def set_value(self, key, fnc):
+        "Stores the value returned by fnc() counting the evaluations done"
+        self.misses += 1
+        self._stack.append(0)
+        try:
+            self[key] = fnc()
+        finally:
+            cost = self._stack.pop() + 1
+        self.costs[key] = cost
+        self._count(cost)
+        return self[key]
+
+    def __repr__(self):
+        return "Cache(hits=%d, misses=%d, saved=%d)" % (
+            self.hits,
+            self.misses,
+            self.saved,
+        )
+
+
 def compute(obj, **kwargs):
-    "Compute the value of a tunable object"
+    """
+    Compute the value of a tunable object
+
+    Parameters
+    ----------
+    obj: Any
+        The object to compute
+    cache: bool or Cache
+        If given, each node is evaluated only once and the results are
+        stored in the cache. If True a new Cache is used.
+    executor: str
+        The engine used for evaluating the graph. By default the graph is
+        computed recursively. Options are:
+        - iterative: evaluates the nodes in topological order (implies cache).
+        - threads: evaluates independent nodes concurrently in a thread pool
+          (implies cache). Accepts max_workers and stats, see help(threads).
+        - release: as iterative but the value of each node is dropped as soon
+          as all the nodes depending on it have been evaluated. Accepts reuse
+          and stats, see help(release).
+        The evaluation of the nodes can be traced with a Tracer,
+        see help(Tracer).
+    maxiter: int
+        Maximum number of times the __compute__ method is called on the result
+    graph: Graph
+        The graph used for resolving the keys
+    """
+    executor = kwargs.pop("executor", None)
+    if executor is not None:
+        # pylint: disable=import-outside-toplevel
+        from .executor import executors
+
+        if executor not in executors:
+            raise ValueError(
+                "Unknown executor %s. Available: %s" % (executor, tuple(executors))
+            )
+        return executors[executor](obj, **kwargs)
+
     kwargs.setdefault("maxiter", 3)
     if kwargs["maxiter"] <= 0:
         return obj
     if isinstance(obj, Node):
         kwargs.setdefault("graph", Node(obj).graph)
+
+    cache = kwargs.get("cache", None)
+    if cache is True:
+        cache = kwargs["cache"] = Cache()
+    if cache is not None and cache is not False and isinstance(obj, Key):
+        key = Key(obj).key
+        if key in cache:
+            return cache.get_value(key)
+        return cache.set_value(key, lambda: _compute(obj, **kwargs))
+
+    return _compute(obj, **kwargs)
+
+
+def _compute(obj, **kwargs):
+    "Computes the object without looking up the cache"
+    tracer = tracing.current
+    if tracer is not None and isinstance(obj, Key):
+        return tracer.record(Key(obj).key, _evaluate, obj, **kwargs)
+    return _evaluate(obj, **kwargs)
+
+
+def _evaluate(obj, **kwargs):
+    "Evaluates the object"
     if isinstance(obj, Key) and not isinstance(obj, Node):
         obj = kwargs["graph"][obj].value
     try:
@@ -142,13 +305,10 @@ class Object:
         key = self.label + "-"
 
         if self.uid:
-            key = key + md5(dumps(self.uid)).hexdigest()
+            key = key + tokenize(self.uid)
         else:
             try:
-                parts = tuple(
-                    Key(part) if isinstance(part, Key) else part for part in self
-                )
-                key = key + md5(dumps(parts)).hexdigest()
+                key = key + tokenize(*self)
             except Exception as _:
                 self.uid = str(uuid4())
                 return self.key
@@ -178,6 +338,21 @@ Object.__eq2__ = Object.__eq__
 Object.__eq__ = lambda self, value: self.obj == value or self.__eq2__(value)
 
 
+impure_functions = set()
+
+
+def impure(fnc):
+    """
+    Marks the function as impure, e.g. if it has side effects or returns
+    different results for the same arguments. The calls to impure functions
+    are not merged nor folded by the optimizations of the graph
+    (see HighLevel.optimize and HighLevel.fold).
+    Can be used as decorator.
+    """
+    impure_functions.add(fnc)
+    return fnc
+
+
 def function(fnc, *args, **kwargs):
     """
     A tunable function call.
@@ -230,6 +405,15 @@ class Function(Object):
         "Alias of obj"
         return self.obj
 
+    @property
+    def pure(self):
+        "Whether the function has not been marked as impure"
+        try:
+            return self.fnc not in impure_functions
+        except TypeError:
+            # not hashable
+            return True
+
     def copy(self, **kwargs):
         "Returns a copy of self"
         kwargs.setdefault("args", self.args)
@@ -252,7 +436,14 @@ class Function(Object):
         fnc = cmpt(super().__compute__(**kwargs))
         args = tuple(map(cmpt, self.args))
         kwargs = dict(zip(self.kwargs.keys(), map(cmpt, self.kwargs.values())))
-        res = fnc(*args, **kwargs)
+        return self.result(fnc, args, fnc(*args, **kwargs))
+
+    @staticmethod
+    def result(fnc, args, res):
+        """
+        Returns the result res of the call fnc(*args, ...).
+        If res is None, the object modified by the call is returned instead.
+        """
         if res is None:
             if ismethod(fnc) or fnc is setattr:
                 return args[0]
@@ -360,7 +551,8 @@ def add_operators(cls, wrapper):
     setattr(cls, "__getattr__", wrapper(getattr))
 
     for fnc in dir(operator):
-        if fnc.startswith("__"):
+        # the methods of the class (e.g. __call__ since python 3.11) are kept
+        if fnc.startswith("__") and fnc not in cls.__dict__:
             try:
                 fnc2 = getattr(operator, fnc[2:-2])
             except AttributeError:
@@ -9,9 +9,8 @@ __all__ = [
 from collections.abc import Iterable
 from dataclasses import dataclass
 from typing import Any
-from itertools import permutations
-from math import factorial
 from .tunable import Tunable, Object, varname
+from .space import space, size_of, Permutations
 
 
 def variable(var, default=None, label=None, uid=None):
@@ -132,12 +131,26 @@ class Variable(Object):
     @property
     def size(self):
         "Returns the size of the variable range"
-        return len(self.var)
+        return size_of(self.values)
 
     @property
     def values(self):
-        "Returns the value in the variable range"
-        return self.var
+        "Returns the value space of the variable range. See tuneit.space"
+        try:
+            return self._space
+        except AttributeError:
+            self._space = self.make_space()
+            return self._space
+
+    def make_space(self):
+        "Returns the value space of the variable"
+        return space(self.var)
+
+    def get_value(self, index):
+        "Returns the value at the given index of the variable range"
+        if not 0 <= index < self.size:
+            raise IndexError("Index %s out of range" % index)
+        return self.values[index]
 
     def __compute__(self, **kwargs):
         if not self.fixed:
@@ -172,10 +185,5 @@ class Variable(Object):
 class Permutation(Variable):
     "Permutations of the given list"
 
-    @property
-    def size(self):
-        return factorial(len(self.var))
-
-    @property
-    def values(self):
-        return permutations(self.var)
+    def make_space(self):
+        return Permutations(self.var)